@@ -0,0 +1,84 @@
+"""Compare the historical and current escaping of `FROM` keywords within functions.
+
+Parameters
+----------
+: int
+    Number(s) of function calls to generate the queries with.
+
+Returns
+-------
+: str
+    Timings of both implementations for each number of function calls, one line each.
+
+Usage
+-----
+```shell
+$ python bench_clean_functions.py [<NUMBER OF CALLS> [...]]
+```
+
+Example
+-------
+```shell
+$ python bench_clean_functions.py
+$ python bench_clean_functions.py 1000 10000
+```
+
+Note
+----
+The historical implementation (regular expressions applied until the query stops
+changing, copying the whole query for each match) is kept below for reference. The
+queries are generated (and cleaned up) as in `bench_suite.py`, the calls spread over ten
+CTEs, and timed by its `timeit()` (best of three runs).
+
+"""
+
+import re
+import sys
+
+from bench_suite import generate_sql, timeit
+from sql_to_json import clean_functions, clean_query
+
+
+def clean_functions_legacy(query: str) -> str:
+    r"""Escape `FROM` operators in SQL functions, the historical way.
+
+    Parameters
+    ----------
+    query : str
+        The SQL query.
+
+    Returns
+    -------
+    : str
+        Cleaned up query.
+
+    """
+    # clean up the query until its length does not change anymore
+    maxn = 1e99
+    while len(query) != maxn:
+        maxn = len(query)
+
+        for r in (
+            r"(\(\s+['\"].+?['\"]\s+)from(\s+\S+?\s+\))",
+            r"(\(\s+\S+?\s+)from(\s+\S+?\s+\))",
+            r"(\(\s+\S+?\s+)from(\s+\S+?\s+\()",  # reversed bracket
+        ):
+            for m in re.finditer(r, query):
+                query = query.replace(m.group(0), f"{m.group(1)}%FROM%{m.group(2)}")
+
+    return query
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [250, 500, 1000, 2000, 4000]
+
+    sys.stdout.write(f"{'calls':>8} {'length':>10} {'legacy':>10} {'current':>10}\n")
+    for n in counts:
+        q = clean_query(generate_sql(ctes=10, extracts=n))
+
+        # make sure we compare apples to apples
+        t0, legacy = timeit(clean_functions_legacy, q)
+        t1, current = timeit(clean_functions, q)
+        assert legacy == current
+
+        sys.stdout.write(f"{n:>8} {len(q):>10} {t0[0]:>9.4f}s {t1[0]:>9.4f}s\n")
@@ -0,0 +1,106 @@
+"""Compare the historical and current `Mermaid` emitters on graphs of increasing size.
+
+Parameters
+----------
+: int
+    Number(s) of objects to generate the graphs with.
+
+Returns
+-------
+: str
+    Size of the output and timings of both implementations for each number of objects,
+    one line each.
+
+Usage
+-----
+```shell
+$ python bench_format_json.py [<NUMBER OF OBJECTS> [...]]
+```
+
+Example
+-------
+```shell
+$ python bench_format_json.py
+$ python bench_format_json.py 10000 100000
+```
+
+Note
+----
+The historical implementation (string concatenation, and a link between each pair of
+objects rather than each dependency) is kept below for reference; it is only timed up
+to 2000 objects, its output growing quadratically with the number of objects. The
+current implementation should show a constant time and size per link. The graphs are
+generated as in `bench_suite.py`, with 1.5 dependencies per object, and timed by its
+`timeit()` (best of three runs).
+
+"""
+
+import sys
+
+from bench_suite import generate_dag, timeit
+from format_json import to_mmd
+
+
+def to_mmd_legacy(objects: dict[str, list[str]]) -> str:
+    r"""Convert the JSON content to `Mermaid` syntax, the historical way.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : str
+        `Mermaid` diagram.
+
+    """
+    # always top-bottom, manually change it if you want
+    d = "graph TB\n"
+
+    # build the list of unique nodes
+    nodes: dict[str, int] = {}
+    i = 0
+    for n1, deps in objects.items():
+        if n1 not in nodes:
+            i += 1
+            nodes[n1] = i
+        for n2 in deps:
+            if n2 not in nodes:
+                i += 1
+                nodes[n2] = i
+
+    # nodes
+    d += "  %% nodes\n"
+    for i, n in enumerate(nodes):
+        d += f"  node{i}({n})\n"
+
+    # links
+    d += "  %% links\n"
+    for n1 in objects:
+        for n2 in objects:
+            d += f"  node{nodes[n1]} --- node{nodes[n2]}\n"
+
+    return d
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [500, 1000, 2000, 8000, 32000, 128000]
+
+    sys.stdout.write(
+        f"{'objects':>8} {'links':>8} {'lines':>10} {'bytes':>11} {'legacy':>10} "
+        f"{'current':>10} {'per link':>10}\n"
+    )
+    for n in counts:
+        o = generate_dag(nodes=n, edges=n * 3 // 2)
+        e = sum(len(deps) for deps in o.values())
+
+        legacy = (
+            f"{timeit(to_mmd_legacy, o)[0][0]:>9.4f}s" if n <= 2000 else f"{'-':>10}"
+        )
+        t, d = timeit(to_mmd, o)
+
+        sys.stdout.write(
+            f"{n:>8} {e:>8} {d.count(chr(10)):>10} {len(d):>11} {legacy} "
+            f"{t[0]:>9.4f}s {t[0] / e * 1e6:>8.3f}us\n"
+        )
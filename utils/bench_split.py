@@ -0,0 +1,130 @@
+"""Compare the historical and current CTE splitters on queries of increasing size.
+
+Parameters
+----------
+: int
+    Number(s) of CTEs to generate the queries with.
+
+Returns
+-------
+: str
+    Timings of both implementations for each number of CTEs, one line each.
+
+Usage
+-----
+```shell
+$ python bench_split.py [<NUMBER OF CTES> [...]]
+```
+
+Example
+-------
+```shell
+$ python bench_split.py
+$ python bench_split.py 100 1000 10000
+```
+
+Note
+----
+The historical implementation (character-by-character reading of the subqueries, and
+search from the start of the query after each replacement) is kept below for reference.
+The queries are generated (and cleaned up) as in `bench_suite.py`, without function
+calls, and timed by its `timeit()` (best of three runs).
+
+"""
+
+import re
+import sys
+
+from bench_suite import generate_sql, timeit
+from sql_to_json import _split, clean_functions, clean_query
+
+
+def _split_legacy(
+    query: str, parts: dict[str, str] | None = None
+) -> tuple[str, dict[str, str]]:
+    r"""Extract and parse subqueries from a query (or subquery), the historical way.
+
+    Parameters
+    ----------
+    query : str
+        The DDL to parse.
+    parts : dict[str, list[str]]
+        Dictionary of [sub]queries and associated DDL that were already parsed.
+
+    Returns
+    -------
+    : str
+        The query, cleaned from its parts.
+    : dict[str, list[str]]
+        Dictionary of [sub]queries and associated DDL.
+
+    """
+    parts = {} if parts is None else parts
+
+    # regular expression to catch subquery
+    r = r"([^\s]+)(\s+as\s+)(\(\s+select)"
+
+    # extract subqueries until the length of the string does not change anymore
+    maxn = 1e99
+    while len(query) != maxn:
+        maxn = len(query)
+
+        # find a match
+        if (m := re.search(r, query)) is not None:
+            n = m.group(1)  # name of the subquery
+            a = m.group(2)  # ... as ...
+            i = m.end(2)  # start of the subquery
+            b = 0  # number of open/close brackets
+            s = ""  # stored characters
+
+            read = True  # store the characters until false
+            while read:
+                # fetch the next character
+                try:
+                    c = query[i]
+                except IndexError:
+                    c = None
+
+                # count opening/closing brackets
+                b += 1 if c == "(" else 0
+                b -= 1 if c == ")" else 0
+
+                # add the character to the stored string
+                s += c if c is not None else ""
+
+                # iterate
+                i += 1
+
+                # stop reading when the counts reach 0
+                if not b or c is None:
+                    read = not read
+
+            # remove the part(s) from the query and iterate
+            query = query.replace(f"{n}{a}{s}", f"%SUBQUERY:{n}%", 1)
+
+            # call itself over the subquery if it needs to be parsed further
+            if re.search(r, s) is not None:
+                s, parts = _split_legacy(s.strip(), parts)
+
+            # clean up further to make it readable
+            s = re.sub(r"select\s+(.*?)\s+from", "select %COLUMNS% from", s)
+
+            # store the query and its parts
+            parts[n] = s
+
+    return query, parts
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [25, 50, 100, 200, 400, 800]
+
+    sys.stdout.write(f"{'ctes':>8} {'length':>10} {'legacy':>10} {'current':>10}\n")
+    for n in counts:
+        q = clean_functions(clean_query(generate_sql(ctes=n, extracts=0)))
+
+        # make sure we compare apples to apples
+        t0, legacy = timeit(lambda q: _split_legacy(q, {}), q)
+        t1, current = timeit(lambda q: _split(q, {}), q)
+        assert legacy == current
+
+        sys.stdout.write(f"{n:>8} {len(q):>10} {t0[0]:>9.4f}s {t1[0]:>9.4f}s\n")
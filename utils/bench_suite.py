@@ -0,0 +1,406 @@
+"""Time the hot paths on synthetic queries and graphs, and catch regressions.
+
+Parameters
+----------
+: str
+    Parameters of the query and graph generators, as `key=value` pairs (comma-separated).
+
+Returns
+-------
+: str
+    JSON-formatted object listing, for each benchmark, the size of its input, latency
+    percentiles and mean (in seconds), throughput (input units per second) and peak
+    memory (in bytes).
+
+Usage
+-----
+```shell
+$ python bench_suite.py [--sql <KEY=VALUE,...>] [--dag <KEY=VALUE,...>]
+$ python bench_suite.py [...] [--repeat <N>] [--only <NAME,...>] [--output <FILE>]
+$ python bench_suite.py [...] --baseline <FILE> [--threshold <RATIO>]
+```
+
+Example
+-------
+```shell
+$ python bench_suite.py --output baseline.json
+$ python bench_suite.py --sql ctes=200,depth=3,extracts=100 --dag nodes=50000,edges=150000
+$ python bench_suite.py --baseline baseline.json --threshold 0.25
+```
+
+Note
+----
+* Queries are generated with `ctes` CTEs (default 50), one in ten embedding nested CTEs
+  `depth` levels deep (default 2), each selecting `length` columns (default 10) plus
+  `extracts` `extract(... from ...)` calls spread over the whole query (default 50).
+* Graphs are generated with `nodes` objects (default 10,000) spread over `depth` levels
+  (default 10), and `edges` dependencies (default 30,000) each from an object to an
+  object of a lower level.
+* Latencies are collected over `--repeat` runs (default 20) of each benchmark; peak
+  memory over one more, traced by `tracemalloc` (which would slow the timed runs down).
+* Provide a previous output via `--baseline` to compare against it: the script exits
+  with an error if the median latency or peak memory of any benchmark grew by more
+  than `--threshold` (default 0.2, _i.e._ 20%), listing the regressions on `stderr`.
+  Only compare runs using the same generator parameters, on the same machine.
+* The generators and `timeit()` are shared with the `bench_*.py` scripts, which compare
+  the historical and current implementations of single steps as the input grows.
+
+"""
+
+import json
+import pathlib
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import TypeVar
+
+from csv_to_json import to_json
+from filter_json import filter_json
+from format_json import to_dot, to_mmd
+from sql_to_json import (
+    _split,
+    clean_functions,
+    clean_query,
+    fetch_dependencies,
+    split_query,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def generate_sql(
+    ctes: int = 50, depth: int = 2, length: int = 10, extracts: int = 50, seed: int = 0
+) -> str:
+    r"""Generate a query chaining CTEs, some embedding nested CTEs.
+
+    Parameters
+    ----------
+    ctes : int
+        Number of CTEs.
+    depth : int
+        Nesting depth of the nested CTEs, embedded in one CTE in ten.
+    length : int
+        Number of columns selected by each CTE.
+    extracts : int
+        Number of `extract(... from ...)` calls, spread over the CTEs.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    : str
+        The query, spread over multiple lines and in mixed case like a human would.
+
+    """
+    rng = random.Random(seed)
+    calls = [extracts // ctes + (i < extracts % ctes) for i in range(ctes)]
+
+    def nested(i: int, d: int) -> str:
+        if not d:
+            return f"SELECT * FROM schema.table{i}"
+        return (
+            f"SELECT * FROM (\n  WITH nested{i}_{d} AS ({nested(i, d - 1)})\n"
+            f"  SELECT * FROM nested{i}_{d}\n)"
+        )
+
+    q = []
+    for i in range(ctes):
+        columns = [f"attr{rng.randrange(1000)}" for _ in range(length)]
+        columns += [
+            rng.choice(
+                [
+                    f"extract(year from attr{j}) AS year{j}",
+                    (
+                        f"EXTRACT(month FROM to_timestamp(trim('\"' from attr{j}), "
+                        f"'YYYY-MM-DD')) AS month{j}"
+                    ),
+                ]
+            )
+            for j in range(calls[i])
+        ]
+        if i % 10 == 0:
+            source = f"({nested(i, depth)}) AS n"
+        else:
+            source = (
+                f"subquery{i - 1}\n    JOIN schema.table{i} "
+                f"ON subquery{i - 1}.attr = schema.table{i}.attr"
+            )
+        q.append(f"subquery{i} AS (\n  SELECT {', '.join(columns)}\n  FROM {source}\n)")
+
+    q.append(f"SELECT * FROM subquery{ctes - 1};")
+
+    return "CREATE VIEW schema.view AS\nWITH\n" + ",\n".join(q[:-1]) + f"\n{q[-1]}"
+
+
+def generate_dag(
+    nodes: int = 10_000, edges: int = 30_000, depth: int = 10, seed: int = 0
+) -> dict[str, list[str]]:
+    r"""Generate a random acyclic graph of objects and upstream dependencies.
+
+    Parameters
+    ----------
+    nodes : int
+        Number of objects.
+    edges : int
+        Number of dependencies (fewer if that many cannot be drawn).
+    depth : int
+        Number of levels the objects are spread over; objects only depend on objects of
+        lower levels.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    """
+    rng = random.Random(seed)
+    level = sorted(rng.randrange(depth) for _ in range(nodes))
+    names = [f"schema{l}.table{i}" for i, l in enumerate(level)]
+
+    # objects of lower levels come first
+    first = {}
+    for i, l in enumerate(level):
+        first.setdefault(l, i)
+
+    objects: dict[str, dict[str, None]] = {n: {} for n in names}
+    candidates = [i for i, l in enumerate(level) if first[l]]
+
+    for _ in range(edges * 2):
+        if not edges or not candidates:
+            break
+        i = rng.choice(candidates)
+        d = names[rng.randrange(first[level[i]])]
+        if d not in objects[names[i]]:
+            objects[names[i]][d] = None
+            edges -= 1
+
+    return {n: list(deps) for n, deps in objects.items()}
+
+
+def benchmarks(
+    sql: dict[str, int], dag: dict[str, int]
+) -> dict[str, tuple[Callable, object, int]]:
+    r"""Prepare the inputs of the benchmarks.
+
+    Parameters
+    ----------
+    sql : dict[str, int]
+        Parameters of the query generator.
+    dag : dict[str, int]
+        Parameters of the graph generator.
+
+    Returns
+    -------
+    : dict[str, tuple[Callable, object, int]]
+        Function to time, its input (the output of the previous steps of the pipeline)
+        and the size thereof (in characters for queries, dependencies for graphs), for
+        each benchmark.
+
+    """
+    raw = generate_sql(**sql)
+    cleaned = clean_query(raw)
+    escaped = clean_functions(cleaned)
+    parts = split_query(escaped)
+
+    objects = generate_dag(**dag)
+    edges = sum(len(deps) for deps in objects.values())
+    csv = "".join(f"{n},{d}\n" for n, deps in objects.items() for d in deps)
+    root = max(objects, key=lambda n: len(objects[n]))
+
+    return {
+        "clean_query": (clean_query, raw, len(raw)),
+        "clean_functions": (clean_functions, cleaned, len(cleaned)),
+        "_split": (lambda q: _split(q, {}), escaped, len(escaped)),
+        "fetch_dependencies": (fetch_dependencies, parts, len(escaped)),
+        "filter_json": (lambda o: filter_json(root, o), objects, edges),
+        "to_json": (lambda c: to_json(c, {}), csv, edges),
+        "to_mmd": (to_mmd, objects, edges),
+        "to_dot": (to_dot, objects, edges),
+    }
+
+
+def percentile(values: list[float], p: float) -> float:
+    r"""Compute a percentile (nearest rank).
+
+    Parameters
+    ----------
+    values : list[float]
+        Sorted values.
+    p : float
+        Percentile, between 0 and 100.
+
+    Returns
+    -------
+    : float
+        The value below which `p`% of the values fall.
+
+    """
+    return values[max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))]
+
+
+def timeit(func: Callable[[T], R], arg: T, repeat: int = 3) -> tuple[list[float], R]:
+    r"""Time a function over an input.
+
+    Parameters
+    ----------
+    func : Callable[[T], R]
+        Function to time.
+    arg : T
+        Its input.
+    repeat : int
+        Number of runs, at least one.
+
+    Returns
+    -------
+    : list[float]
+        Latency of each run (in seconds), sorted: the first one is the best.
+    : R
+        Output of the last run.
+
+    """
+    t = []
+
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        r = func(arg)
+        t.append(time.perf_counter() - t0)
+
+    return sorted(t), r
+
+
+def measure(func: Callable[[T], object], arg: T, size: int, repeat: int = 20) -> dict:
+    r"""Time a function over an input, and trace its peak memory.
+
+    Parameters
+    ----------
+    func : Callable[[T], object]
+        Function to time.
+    arg : T
+        Its input.
+    size : int
+        Size of the input.
+    repeat : int
+        Number of timed runs.
+
+    Returns
+    -------
+    : dict
+        Size of the input, latency percentiles and mean, throughput and peak memory.
+
+    """
+    t, _ = timeit(func, arg, repeat)
+
+    tracemalloc.start()
+    func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "size": size,
+        "p50": percentile(t, 50),
+        "p90": percentile(t, 90),
+        "p99": percentile(t, 99),
+        "mean": statistics.fmean(t),
+        "throughput": size / statistics.fmean(t),
+        "peak_memory": peak,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.2) -> list[str]:
+    r"""List the regressions compared to a baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Output of the current run.
+    baseline : dict
+        Output of a previous run.
+    threshold : float
+        Relative growth (of the median latency or peak memory) tolerated.
+
+    Returns
+    -------
+    : list[str]
+        One line per regression, empty if none.
+
+    """
+    regressions = []
+
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        for k in ("p50", "peak_memory"):
+            if (b := baseline[name][k]) and r[k] > b * (1 + threshold):
+                regressions.append(
+                    f"{name}: {k} {b:.6g} -> {r[k]:.6g} (+{r[k] / b - 1:.0%})"
+                )
+
+    return regressions
+
+
+def parse_params(arg: str) -> dict[str, int]:
+    r"""Parse generator parameters.
+
+    Parameters
+    ----------
+    arg : str
+        Comma-separated `key=value` pairs.
+
+    Returns
+    -------
+    : dict[str, int]
+        Parameters.
+
+    """
+    return {k: int(v) for k, v in (p.split("=") for p in arg.split(",") if p)}
+
+
+if __name__ == "__main__":
+    # command line arguments
+    options: dict[str, str | None] = {}
+    for o in ("--sql", "--dag", "--repeat", "--only", "--output", "--baseline"):
+        if o in sys.argv:
+            i = sys.argv.index(o)
+            options[o] = sys.argv[i + 1]
+            del sys.argv[i : i + 2]
+        else:
+            options[o] = None
+
+    if "--threshold" in sys.argv:
+        i = sys.argv.index("--threshold")
+        threshold = float(sys.argv[i + 1])
+        del sys.argv[i : i + 2]
+    else:
+        threshold = 0.2
+
+    sql = parse_params(options["--sql"] or "")
+    dag = parse_params(options["--dag"] or "")
+    repeat = int(options["--repeat"] or 20)
+    only = options["--only"].split(",") if options["--only"] else None
+
+    # run
+    results = {
+        name: measure(func, arg, size, repeat)
+        for name, (func, arg, size) in benchmarks(sql, dag).items()
+        if only is None or name in only
+    }
+
+    # output
+    r = json.dumps(results, indent=4)
+    if options["--output"] is not None:
+        pathlib.Path(options["--output"]).write_text(r)
+    sys.stdout.write(f"{r}\n")
+
+    # compare
+    if options["--baseline"] is not None:
+        baseline = json.loads(pathlib.Path(options["--baseline"]).read_text())
+        if regressions := compare(results, baseline, threshold):
+            for line in regressions:
+                sys.stderr.write(f"{line}\n")
+            sys.exit(1)
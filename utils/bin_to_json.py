@@ -0,0 +1,67 @@
+"""Convert binary graph file(s) to JSON, or JSON file(s) to the binary format.
+
+Parameters
+----------
+: str
+    Path to the binary or JSON file(s).
+
+Returns
+-------
+: str
+    JSON-formatted, nested list of object and upstream dependencies (or the same in the
+    binary format).
+
+Usage
+-----
+```shell
+$ python script.py <FILE> [<FILE> [...]] [--pretty]
+$ python script.py <FILE> [<FILE> [...]] --format bin [--compress]
+```
+
+Example
+-------
+```shell
+$ python script.py dependencies.bin --pretty
+$ python script.py file1.bin file2.json
+$ python script.py dependencies.json --format bin --compress > dependencies.bin
+```
+
+Note
+----
+* Each file is read in either format (detected from its first bytes), and all are
+  merged: objects listed in several files see their dependencies combined.
+* The binary format (see `graph.py`) stores the names once, and the dependencies as
+  arrays of integer ids; `--compress` compresses it further via `zlib`. All scripts
+  producing objects and dependencies write it via `--format bin`, and all scripts
+  consuming them read it as they read JSON: convert to JSON only to hand the output
+  over to something else.
+
+"""
+
+import sys
+
+from graph import dump_graph, read_graph
+
+if __name__ == "__main__":
+    # command line arguments
+    if "--pretty" in sys.argv:
+        sys.argv.remove("--pretty")
+        indent = 4
+    else:
+        indent = None
+
+    if "--format" in sys.argv:
+        i = sys.argv.index("--format")
+        fmt = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        fmt = "json"
+
+    if "--compress" in sys.argv:
+        sys.argv.remove("--compress")
+        compress = True
+    else:
+        compress = False
+
+    # merge each provided file, and convert
+    sys.stdout.buffer.write(dump_graph(read_graph(sys.argv[1:]), fmt, compress, indent))
@@ -0,0 +1,328 @@
+"""Collapse the objects of a JSON object into groups, to render smaller diagrams.
+
+Parameters
+----------
+: str
+    Path to the JSON file(s).
+
+Returns
+-------
+: str
+    JSON-formatted, nested list of group and upstream groups.
+
+Usage
+-----
+```shell
+$ python script.py <JSON FILE> [<JSON FILE> [...]] --by <schema|component|scc>
+$ python script.py <JSON FILE> [<JSON FILE> [...]] [--by <...>] --reduce
+$ python script.py <JSON FILE> [<JSON FILE> [...]] [...] --format <json|bin> [--compress]
+```
+
+Example
+-------
+```shell
+$ python script.py dependencies.json --by schema
+$ python script.py dependencies.json --by scc --reduce
+```
+
+Note
+----
+* Objects are grouped by `schema` (the `schema` part of `schema.table`), by weakly
+  connected `component` (objects linked in any direction), or by strongly connected
+  component (`scc`, objects depending on each other through a cycle); each group is
+  named after its schema, or after its first object (followed by the number of other
+  objects it holds).
+* Dependencies between objects of a same group are dropped, dependencies between groups
+  are listed once.
+* `--reduce` drops the dependencies implied by others (`A -> C` if `A -> B -> C`); the
+  (grouped) objects cannot depend on each other through a cycle: the cycles are
+  reported (one line each) on `stderr`, and the script exits with an error.
+* Files in the binary format of `graph.py` are read as well as JSON files (detected
+  from their first bytes), and `--format bin` writes the output in that format
+  (`--compress`ed if requested).
+
+"""
+
+import sys
+from collections.abc import Callable
+
+from graph import dump_graph, read_graph
+from reduce_json import CycleError, format_cycle, transitive_reduction
+
+
+def list_nodes(objects: dict[str, list[str]]) -> dict[str, None]:
+    r"""List the unique nodes, objects and dependencies alike.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : dict[str, None]
+        Nodes, in order of first appearance.
+
+    """
+    nodes: dict[str, None] = {}
+
+    for n, deps in objects.items():
+        nodes[n] = None
+        nodes.update(dict.fromkeys(deps))
+
+    return nodes
+
+
+def by_schema(objects: dict[str, list[str]]) -> dict[str, str]:
+    r"""Group the objects by schema.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : dict[str, str]
+        Name of the group of each node: whatever precedes the last dot of its name, the
+        name itself if not qualified.
+
+    """
+    return {n: n.rsplit(".", 1)[0] for n in list_nodes(objects)}
+
+
+def _name(groups: dict[str, int]) -> dict[str, str]:
+    r"""Name numbered groups after their first node.
+
+    Parameters
+    ----------
+    groups : dict[str, int]
+        Number of the group of each node.
+
+    Returns
+    -------
+    : dict[str, str]
+        Name of the group of each node, first node of the group followed by the number
+        of other nodes it holds (if any).
+
+    """
+    first: dict[int, str] = {}
+    sizes: dict[int, int] = {}
+
+    for n, g in groups.items():
+        first.setdefault(g, n)
+        sizes[g] = sizes.get(g, 0) + 1
+
+    return {
+        n: first[g] if sizes[g] == 1 else f"{first[g]} +{sizes[g] - 1}"
+        for n, g in groups.items()
+    }
+
+
+def by_component(objects: dict[str, list[str]]) -> dict[str, str]:
+    r"""Group the objects by weakly connected component.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : dict[str, str]
+        Name of the group of each node.
+
+    Notes
+    -----
+    Union-find (with path halving), the representative of each set being its first
+    node.
+
+    """
+    parent = {n: n for n in list_nodes(objects)}
+    order = {n: i for i, n in enumerate(parent)}
+
+    def find(n: str) -> str:
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    for n1, deps in objects.items():
+        for n2 in deps:
+            r1, r2 = find(n1), find(n2)
+            if r1 != r2:
+                if order[r1] > order[r2]:
+                    r1, r2 = r2, r1
+                parent[r2] = r1
+
+    return _name({n: order[find(n)] for n in parent})
+
+
+def by_scc(objects: dict[str, list[str]]) -> dict[str, str]:
+    r"""Group the objects by strongly connected component.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : dict[str, str]
+        Name of the group of each node.
+
+    Notes
+    -----
+    Tarjan's algorithm, iterative (with an explicit stack) to not hit the recursion
+    limit on long lineages.
+
+    """
+    index: dict[str, int] = {}
+    low: dict[str, int] = {}
+    groups: dict[str, int] = {}
+    stack: list[str] = []
+
+    for root in list_nodes(objects):
+        if root in index:
+            continue
+
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        work = [(root, iter(objects.get(root, ())))]
+
+        while work:
+            n, deps = work[-1]
+
+            # visit the next dependency not visited yet
+            for d in deps:
+                if d not in index:
+                    index[d] = low[d] = len(index)
+                    stack.append(d)
+                    work.append((d, iter(objects.get(d, ()))))
+                    break
+                if d not in groups:
+                    low[n] = min(low[n], index[d])
+
+            # all dependencies visited
+            else:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[n])
+                if low[n] == index[n]:
+                    while True:
+                        d = stack.pop()
+                        groups[d] = index[n]
+                        if d == n:
+                            break
+
+    return _name({n: groups[n] for n in index})
+
+
+def collapse(
+    objects: dict[str, list[str]], groups: dict[str, str]
+) -> dict[str, list[str]]:
+    r"""Collapse the objects into their groups.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+    groups : dict[str, str]
+        Name of the group of each node.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Dictionary of groups and upstream groups, dependencies within groups dropped.
+
+    """
+    collapsed: dict[str, dict[str, None]] = {}
+
+    for n1, deps in objects.items():
+        g1 = groups[n1]
+        if g1 not in collapsed:
+            collapsed[g1] = {}
+        for n2 in deps:
+            if (g2 := groups[n2]) != g1:
+                collapsed[g1][g2] = None
+
+    return {g: list(deps) for g, deps in collapsed.items()}
+
+
+GROUPINGS: dict[str, Callable[[dict[str, list[str]]], dict[str, str]]] = {
+    "schema": by_schema,
+    "component": by_component,
+    "scc": by_scc,
+}
+
+
+def coarsen_json(
+    objects: dict[str, list[str]], by: str | None = None, reduce: bool = False
+) -> dict[str, list[str]]:
+    r"""Group the objects, and/or drop the dependencies implied by others.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+    by : str | None
+        Group the objects by `schema`, `component` or `scc`; not grouped if `None`.
+    reduce : bool
+        Whether to drop the dependencies implied by others.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Dictionary of (grouped) objects and upstream dependencies.
+
+    """
+    if by is not None:
+        if by not in GROUPINGS:
+            msg = f"Unknown grouping: {by}"
+            raise ValueError(msg)
+        objects = collapse(objects, GROUPINGS[by](objects))
+
+    if reduce:
+        objects = transitive_reduction(objects)
+
+    return objects
+
+
+if __name__ == "__main__":
+    # command line arguments
+    if "--by" in sys.argv:
+        i = sys.argv.index("--by")
+        by = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        by = None
+
+    if "--reduce" in sys.argv:
+        sys.argv.remove("--reduce")
+        reduce = True
+    else:
+        reduce = False
+
+    if "--format" in sys.argv:
+        i = sys.argv.index("--format")
+        fmt = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        fmt = "json"
+
+    if "--compress" in sys.argv:
+        sys.argv.remove("--compress")
+        compress = True
+    else:
+        compress = False
+
+    # merge each provided file
+    o = read_graph(sys.argv[1:]).to_json()
+
+    # coarsen, or report the cycles
+    try:
+        sys.stdout.buffer.write(dump_graph(coarsen_json(o, by, reduce), fmt, compress))
+    except CycleError as e:
+        for c in e.cycles:
+            sys.stderr.write(f"{format_cycle(c)}\n")
+        sys.exit(1)
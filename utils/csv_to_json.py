@@ -14,7 +14,9 @@ Returns
 Usage
 -----
 ```shell
-$ python script.py <CSV FILE> [<CSV FILE> [...]]
+$ python script.py <CSV FILE> [<CSV FILE> [...]] [--header]
+$ python script.py <CSV FILE> [<CSV FILE> [...]] --jobs <N>
+$ python script.py <CSV FILE> [<CSV FILE> [...]] --format <json|bin> [--compress]
 ```
 
 Example
@@ -22,13 +24,36 @@ Example
 ```shell
 $ python script.py dependencies.csv
 $ python script.py file1.csv file2.csv file3.csv
+$ python script.py --header export.csv
+$ python script.py --jobs 0 --header export/*.csv
+$ python script.py --header export.csv --format bin > dependencies.bin
 ```
 
+Note
+----
+* The files are streamed row by row (quoted names are supported), such that memory
+  usage depends on the number of unique objects and dependencies rather than on the
+  size of the files.
+* Provide `--header` if the first row of each file holds the column names.
+* Duplicated rows, within or across files, are only listed once.
+* `--jobs` spreads the files (split in shards of whole rows if large) over `N` worker
+  processes (all available cores if `0`), and merges their output without altering it.
+* `--format bin` writes a compact binary format instead of JSON (`--compress`ed if
+  requested), read by the other scripts (much) faster; see `graph.py`.
+
 """
 
-import json
+import concurrent.futures
+import contextlib
+import csv
+import io
+import itertools
+import os
 import pathlib
 import sys
+from collections.abc import Iterable, Iterator
+
+from graph import Graph, dump_graph
 
 
 def to_json(content: str, objects: dict[str, list[str]]) -> dict[str, list[str]]:
@@ -65,13 +90,272 @@ def to_json(content: str, objects: dict[str, list[str]]) -> dict[str, list[str]]
     return objects
 
 
+def read_edges(f: Iterable[str], header: bool = False) -> Iterator[tuple[str, str]]:
+    r"""Read the `object1,object2` pairs from CSV content, one row at a time.
+
+    Parameters
+    ----------
+    f : Iterable[str]
+        The CSV content, file object opened with `newline=""` or any iterable of lines.
+    header : bool
+        Whether the first row holds the column names, and is to be skipped.
+
+    Returns
+    -------
+    : Iterator[tuple[str, str]]
+        Pairs of object and object depended upon, empty rows skipped.
+
+    """
+    rows = csv.reader(f)
+
+    if header:
+        next(rows, None)
+
+    for r in rows:
+        if len(r) == 2:
+            yield r[0], r[1]
+        elif any(v.strip() for v in r):
+            msg = f"Expected two columns, got {len(r)}: {r}"
+            raise ValueError(msg)
+
+
+def stream_json(
+    f: Iterable[str],
+    objects: dict[str, dict[str, None]] | None = None,
+    header: bool = False,
+) -> dict[str, dict[str, None]]:
+    r"""Convert the CSV content to JSON, one row at a time.
+
+    Parameters
+    ----------
+    f : Iterable[str]
+        The CSV content, file object opened with `newline=""` or any iterable of lines.
+    objects : dict[str, dict[str, None]] | None
+        Dictionary of objects already parsed.
+    header : bool
+        Whether the first row holds the column names, and is to be skipped.
+
+    Returns
+    -------
+    : dict[str, dict[str, None]]
+        Updated dictionary of objects and (ordered set of) dependencies, as `to_json()`.
+
+    Notes
+    -----
+    Names are interned: an object appearing in many rows is stored once.
+
+    """
+    objects = {} if objects is None else objects
+
+    for c, p in read_edges(f, header):
+        # list dependencies as parent -> (set of) child(ren)
+        if p in objects:
+            if c not in (children := objects[p]):
+                children[sys.intern(c)] = None
+        else:
+            objects[sys.intern(p)] = {sys.intern(c): None}
+
+    return objects
+
+
+def graph_csv(
+    f: Iterable[str], graph: Graph | None = None, header: bool = False
+) -> Graph:
+    r"""Convert the CSV content to an in-memory graph, one row at a time.
+
+    Parameters
+    ----------
+    f : Iterable[str]
+        The CSV content, file object opened with `newline=""` or any iterable of lines.
+    graph : Graph | None
+        Graph of objects already parsed, a new one if `None`.
+    header : bool
+        Whether the first row holds the column names, and is to be skipped.
+
+    Returns
+    -------
+    : Graph
+        Updated graph of objects and dependencies, as `stream_json()` once converted
+        via `Graph.to_json()`.
+
+    Notes
+    -----
+    Names are interned and dependencies stored as integer ids: a fraction of the memory
+    of the dictionary of `stream_json()` on large files.
+
+    """
+    graph = Graph() if graph is None else graph
+
+    for c, p in read_edges(f, header):
+        # list dependencies as parent -> (set of) child(ren)
+        graph.add(p, (c,))
+
+    return graph
+
+
+def shard_files(
+    paths: Iterable[str | pathlib.Path], shards: int
+) -> list[tuple[str, int, int]]:
+    r"""Split the CSV file(s) into byte ranges of whole rows.
+
+    Parameters
+    ----------
+    paths : Iterable[str | pathlib.Path]
+        Paths to the CSV files.
+    shards : int
+        Approximate number of ranges to split the files into, altogether.
+
+    Returns
+    -------
+    : list[tuple[str, int, int]]
+        Path, start and end (excluded) of each range, in order.
+
+    Notes
+    -----
+    Files are split proportionally to their size, each range starting at the beginning
+    of a row. Quoted names embedding line breaks are not supported.
+
+    """
+    sizes = {str(a): pathlib.Path(a).stat().st_size for a in paths}
+    target = max(1, sum(sizes.values()) // max(1, shards))
+
+    ranges = []
+    for a, size in sizes.items():
+        bounds = [0]
+
+        with pathlib.Path(a).open("rb") as f:
+            for i in range(1, -(-size // target)):
+                if i * target > bounds[-1]:
+                    f.seek(i * target - 1)
+                    f.readline()
+                    bounds.append(min(f.tell(), size))
+
+        bounds.append(size)
+        ranges.extend((a, i, j) for i, j in itertools.pairwise(bounds) if i < j)
+
+    return ranges
+
+
+def _shard_json(
+    shard: tuple[str, int, int], header: bool = False
+) -> dict[str, list[str]]:
+    r"""Convert a range of a CSV file to JSON.
+
+    Parameters
+    ----------
+    shard : tuple[str, int, int]
+        Path, start and end (excluded) of the range.
+    header : bool
+        Whether the first row of the file holds the column names, and is to be skipped.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Dictionary of objects and dependencies.
+
+    """
+    a, i, j = shard
+
+    with pathlib.Path(a).open("rb") as f:
+        f.seek(i)
+        content = f.read(j - i).decode()
+
+    o = stream_json(io.StringIO(content, newline=""), None, header and not i)
+
+    return {k: list(v) for k, v in o.items()}
+
+
+def sharded_json(
+    paths: Iterable[str | pathlib.Path], jobs: int = 0, header: bool = False
+) -> dict[str, dict[str, None]]:
+    r"""Convert the CSV file(s) to JSON, in parallel.
+
+    Parameters
+    ----------
+    paths : Iterable[str | pathlib.Path]
+        Paths to the CSV files.
+    jobs : int
+        Number of worker processes; `1` processes everything in the current process,
+        `0` uses all available cores.
+    header : bool
+        Whether the first row of each file holds the column names, and is to be skipped.
+
+    Returns
+    -------
+    : dict[str, dict[str, None]]
+        Dictionary of objects and (ordered set of) dependencies, as `stream_json()`.
+
+    Notes
+    -----
+    The files are split in a few shards per worker (see `shard_files()`), each worker
+    converting one shard at a time. Their output is merged in order, such that the
+    result is identical to a serial run.
+
+    """
+    jobs = jobs or os.cpu_count() or 1
+    shards = shard_files(paths, jobs * 4)
+
+    objects: dict[str, dict[str, None]] = {}
+
+    with contextlib.ExitStack() as stack:
+        if jobs > 1:
+            executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(jobs))
+            partials = executor.map(_shard_json, shards, itertools.repeat(header))
+        else:
+            partials = map(_shard_json, shards, itertools.repeat(header))
+
+        for o in partials:
+            for p, children in o.items():
+                children = map(sys.intern, children)
+                if p in objects:
+                    objects[p].update(dict.fromkeys(children))
+                else:
+                    objects[sys.intern(p)] = dict.fromkeys(children)
+
+    return objects
+
+
 if __name__ == "__main__":
-    o: dict[str, list[str]] = {}
+    # command line arguments
+    if "--header" in sys.argv:
+        sys.argv.remove("--header")
+        header = True
+    else:
+        header = False
+
+    if "--jobs" in sys.argv:
+        i = sys.argv.index("--jobs")
+        jobs = int(sys.argv[i + 1])
+        del sys.argv[i : i + 2]
+    else:
+        jobs = 1
+
+    if "--format" in sys.argv:
+        i = sys.argv.index("--format")
+        fmt = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        fmt = "json"
+
+    if "--compress" in sys.argv:
+        sys.argv.remove("--compress")
+        compress = True
+    else:
+        compress = False
+
+    o: dict[str, dict[str, None]] = {}
 
     # parse each file
-    for a in sys.argv[1:]:
-        with pathlib.Path(a).open() as f:
-            o = to_json(f.read(), o)
+    if jobs == 1:
+        for a in sys.argv[1:]:
+            with pathlib.Path(a).open(newline="") as f:
+                o = stream_json(f, o, header)
+    else:
+        o = sharded_json(sys.argv[1:], jobs, header)
+
+    # sets to lists, one at a time
+    for k, v in o.items():
+        o[k] = list(v)
 
     # output
-    sys.stdout.write(json.dumps(o))
+    sys.stdout.buffer.write(dump_graph(o, fmt, compress))
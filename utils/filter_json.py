@@ -17,6 +17,13 @@ Usage
 -----
 ```shell
 $ python script.py <OBJECT NAME> <JSON FILE> [<JSON FILE> [...]]
+$ python script.py <OBJECT NAME> <JSON FILE> [...] --direction <upstream|downstream|both>
+$ python script.py <OBJECT NAME> <JSON FILE> [...] --max-depth <N>
+$ python script.py --build-index <INDEX FILE> <JSON FILE> [<JSON FILE> [...]]
+$ python script.py <OBJECT NAME> <INDEX FILE> [--direction <...>] [--max-depth <N>]
+$ python script.py --names-from <NAMES FILE> <JSON OR INDEX FILE> [...] [--union]
+$ python script.py <OBJECT NAME> <JSON OR INDEX FILE> [...] --reduce
+$ python script.py <OBJECT NAME> <JSON OR INDEX FILE> [...] --format <json|bin> [--compress]
 ```
 
 Example
@@ -24,19 +31,245 @@ Example
 ```shell
 $ python script.py fact_thing dependencies.json
 $ python script.py dim_whatever file1.json file2.json file3.json
+$ python script.py dim_whatever dependencies.json --direction both --max-depth 2
+$ python script.py --build-index dependencies.idx dependencies.json
+$ python script.py dim_whatever dependencies.idx --direction downstream
+$ python script.py --names-from tables.txt dependencies.idx --union
+$ python script.py fact_thing dependencies.json --reduce
+$ python script.py fact_thing dependencies.bin --format bin --compress > lineage.bin
 ```
 
+Note
+----
+* Objects upstream (the default), downstream or both of the object provided are
+  fetched, up to `--max-depth` levels away if provided.
+* The output is the subgraph made of these objects (the one filtered for included),
+  each listing the upstream dependencies that are part of the subgraph.
+* To query the same (large) objects repeatedly, build a binary index once with
+  `--build-index` and provide it instead of the JSON file(s): it is memory-mapped, and
+  only the parts of it the query walks through are read from disk. An index is
+  queried alone, it cannot be provided along with other files.
+* Provide a file listing object names (one per line) via `--names-from` to fetch the
+  lineages of all of them in one go: the output maps each name to its own subgraph, or
+  is the union of all subgraphs if `--union` is provided.
+* `--reduce` drops the dependencies implied by others (`A -> C` if `A -> B -> C`) from
+  the output; cycles within it are reported on `stderr` instead.
+* Files in the binary format of `graph.py` are read as well as JSON files (detected
+  from their first bytes), and `--format bin` writes the output in that format (along
+  with `--union` if `--names-from` is provided, for the output to be a single graph).
+* Each file is read once, such that any of them (index included) can be piped, e.g.
+  `python sql_to_json.py file.sql | python script.py fact_thing /dev/stdin`.
+
 """
 
-import json
+import array
+import mmap
 import pathlib
+import struct
 import sys
+import zlib
+from collections.abc import Callable, Hashable, Iterable
+from typing import TYPE_CHECKING
+
+from graph import Graph, dump_graph, read_graph
+from reduce_json import CycleError, format_cycle, transitive_reduction
+
+if TYPE_CHECKING:
+    from typing import Self
+
+# magic bytes, number of nodes, number of objects, number of edges, size of the hash
+INDEX_HEADER = struct.Struct("8sQQQQ")
+INDEX_MAGIC = b"DEPVIZ\x00\x01"
+
+# directions the lineage can be fetched in
+DIRECTIONS = ("upstream", "downstream", "both")
+
+
+def index_json(
+    objects: dict[str, list[str]],
+) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+    r"""Index the objects in both directions.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Dictionary of objects and (deduplicated) upstream dependencies.
+    : dict[str, list[str]]
+        Dictionary of objects and downstream dependencies (objects depending on them).
+
+    Notes
+    -----
+    Build it once and provide it to `filter_json()` to run several queries against the
+    same objects.
+
+    """
+    forward: dict[str, list[str]] = {}
+    reverse: dict[str, list[str]] = {}
+
+    for n, deps in objects.items():
+        forward[n] = list(dict.fromkeys(deps))
+        for d in forward[n]:
+            if d in reverse:
+                reverse[d].append(n)
+            else:
+                reverse[d] = [n]
+
+    return forward, reverse
+
+
+def traverse(
+    roots: Iterable[Hashable],
+    neighbours: Callable[[Hashable], Iterable[Hashable]],
+    max_depth: int | None = None,
+) -> dict[Hashable, int]:
+    r"""Breadth-first traversal of a graph.
+
+    Parameters
+    ----------
+    roots : Iterable[Hashable]
+        Nodes to start from.
+    neighbours : Callable[[Hashable], Iterable[Hashable]]
+        Function returning the neighbours of a node.
+    max_depth : int | None
+        Maximum number of hops away from the roots, unlimited if `None`.
+
+    Returns
+    -------
+    : dict[Hashable, int]
+        Nodes reached (roots included) and their distance to the closest root, in order
+        of discovery.
+
+    Notes
+    -----
+    Each node reached is expanded once, such that the cost is linear in the size of
+    the subgraph traversed.
+
+    """
+    depth = {r: 0 for r in roots}
+    frontier = list(depth)
+
+    d = 0
+    while frontier and (max_depth is None or d < max_depth):
+        d += 1
+        following = []
+        for n in frontier:
+            for m in neighbours(n):
+                if m not in depth:
+                    depth[m] = d
+                    following.append(m)
+        frontier = following
+
+    return depth
+
+
+def closure(
+    root: Hashable,
+    neighbours: Callable[[Hashable], Iterable[Hashable]],
+    memo: dict[Hashable, dict[Hashable, None]],
+) -> dict[Hashable, None]:
+    r"""Fetch all nodes reachable from a node, reusing the closures already computed.
+
+    Parameters
+    ----------
+    root : Hashable
+        Node to start from.
+    neighbours : Callable[[Hashable], Iterable[Hashable]]
+        Function returning the neighbours of a node.
+    memo : dict[Hashable, dict[Hashable, None]]
+        Closures already computed, which the closure of the node is added to.
+
+    Returns
+    -------
+    : dict[Hashable, None]
+        Nodes reachable from the node (node included).
+
+    Notes
+    -----
+    A node whose closure is known is not expanded again: its closure is merged as is.
+    Only the closures of the nodes started from are memoized, such that this only saves
+    work when these nodes are ancestors of each other: a subgraph shared by several of
+    them through other nodes is walked again for each. Memoizing the closure of every
+    node expanded would cost memory quadratic in the depth of the graph (along a chain),
+    rather than linear in the size of the closures asked for.
+
+    """
+    if root in memo:
+        return memo[root]
+
+    reached = {root: None}
+    frontier = [root]
+
+    while frontier:
+        following = []
+        for n in frontier:
+            for m in neighbours(n):
+                if m in reached:
+                    continue
+                if m in memo:
+                    reached.update(memo[m])
+                else:
+                    reached[m] = None
+                    following.append(m)
+        frontier = following
+
+    memo[root] = reached
+
+    return reached
+
+
+def _lineage(
+    root: Hashable,
+    parents: Callable[[Hashable], Iterable[Hashable]],
+    children: Callable[[Hashable], Iterable[Hashable]],
+    direction: str = "upstream",
+    max_depth: int | None = None,
+) -> dict[Hashable, int]:
+    r"""Fetch the nodes along the lineage of a node.
+
+    Parameters
+    ----------
+    root : Hashable
+        Node to start from.
+    parents : Callable[[Hashable], Iterable[Hashable]]
+        Function returning the upstream dependencies of a node.
+    children : Callable[[Hashable], Iterable[Hashable]]
+        Function returning the downstream dependencies of a node.
+    direction : str
+        Fetch the nodes `upstream`, `downstream` or `both`.
+    max_depth : int | None
+        Maximum number of hops away from the node, unlimited if `None`.
+
+    Returns
+    -------
+    : dict[Hashable, int]
+        Nodes reached (root included) and their distance to the root.
+
+    """
+    if direction not in DIRECTIONS:
+        msg = f"Unknown direction: {direction}"
+        raise ValueError(msg)
+
+    included: dict[Hashable, int] = {}
+    if direction in ("upstream", "both"):
+        included.update(traverse([root], parents, max_depth))
+    if direction in ("downstream", "both"):
+        included.update(traverse([root], children, max_depth))
+
+    return included
 
 
 def filter_json(
     name: str,
     objects: dict[str, list[str]],
     _objects: dict[str, list[str]] | None = None,
+    direction: str = "upstream",
+    max_depth: int | None = None,
+    index: tuple[dict[str, list[str]], dict[str, list[str]]] | None = None,
 ) -> dict[str, list[str]]:
     r"""Fetch all objects related to a single object, regardless of the depth.
 
@@ -48,46 +281,696 @@ def filter_json(
         Dictionary of objects and upstream dependencies.
     _objects : dict[str, list[str]]
         Dictionary of objects already parsed.
+    direction : str
+        Fetch the objects `upstream` (depended on), `downstream` (depending on) or
+        `both`.
+    max_depth : int | None
+        Maximum number of hops away from the object, unlimited if `None`.
+    index : tuple[dict[str, list[str]], dict[str, list[str]]] | None
+        Objects indexed in both directions (see `index_json()`), built if not provided.
 
     Returns
     -------
     : dict[str, list[str]]
         Filtered list of upstream and downstream dependencies.
 
+    Notes
+    -----
+    Given the index, the cost is linear in the size of the subgraph returned rather
+    than in the number of objects.
+
     """
     _objects = {} if _objects is None else _objects
 
-    included: list[str] = []
-
-    # filter until the size of the list does not change anymore
-    maxn = 1e99
-    while len(included) != maxn:
-        maxn = len(included)
-
-        # run through all the nodes
-        # expensive if a lot of objects are involved
-        for n, deps in objects.items():
-            if n == name or n in included:
-                for d in deps:
-                    if d not in included:
-                        included.append(d)
+    forward, reverse = index_json(objects) if index is None else index
 
     # all objects along the lineage
+    included = _lineage(
+        name,
+        lambda n: forward.get(n, ()),
+        lambda n: reverse.get(n, ()),
+        direction,
+        max_depth,
+    )
+
+    # and their dependencies within the subgraph
     for i in included:
-        if i in objects and i not in _objects:
-            _objects[i] = objects[i]
+        if i in forward and i not in _objects:
+            _objects[i] = [d for d in forward[i] if d in included]
 
     return _objects
 
 
+def _hash(name: bytes, slots: int) -> int:
+    r"""Hash a name to its first slot in the hash table of the index.
+
+    Parameters
+    ----------
+    name : bytes
+        UTF-8 encoded name of the node.
+    slots : int
+        Size of the hash table, a power of two.
+
+    Returns
+    -------
+    : int
+        Slot to start probing from.
+
+    """
+    return zlib.crc32(name) & (slots - 1)
+
+
+def build_index(objects: dict[str, list[str]], path: str | pathlib.Path) -> None:
+    r"""Write the objects to a binary, memory-mappable index.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+    path : str | pathlib.Path
+        Path to the index file.
+
+    Notes
+    -----
+    The file consists of (all integers unsigned, native byte order):
+
+    * A header: magic bytes, number of nodes (objects first, then the dependencies that
+      are not objects themselves), of objects, of edges, and size of the hash table.
+    * The offsets of the node names in the string table (`n + 1` 64-bit integers).
+    * The forward (upstream) and reverse (downstream) adjacency as compressed sparse
+      rows: `n + 1` 64-bit offsets each, followed by the 32-bit node ids of each array.
+    * An open-addressing (linear probing) hash table mapping the CRC32 of the names to
+      node ids (plus one, zero marking empty slots).
+    * The string table: UTF-8 encoded names laid end to end.
+
+    Each section is padded to 8 bytes.
+
+    """
+    forward, _ = index_json(objects)
+
+    # intern the names, objects first
+    ids: dict[str, int] = {}
+    for n in forward:
+        ids.setdefault(n, len(ids))
+    for deps in forward.values():
+        for d in deps:
+            ids.setdefault(d, len(ids))
+    names = [n.encode() for n in ids]
+
+    # string table
+    offsets = array.array("Q", [0])
+    for n in names:
+        offsets.append(offsets[-1] + len(n))
+
+    # forward adjacency
+    fwd_ptr = array.array("Q", [0])
+    fwd_idx = array.array("I")
+    for deps in forward.values():
+        fwd_idx.extend(ids[d] for d in deps)
+        fwd_ptr.append(len(fwd_idx))
+    fwd_ptr.extend(fwd_ptr[-1:] * (len(ids) - len(forward)))
+
+    # reverse adjacency, by counting
+    counts = [0] * (len(ids) + 1)
+    for i in fwd_idx:
+        counts[i + 1] += 1
+    rev_ptr = array.array("Q", [0] * (len(ids) + 1))
+    for i in range(len(ids)):
+        rev_ptr[i + 1] = rev_ptr[i] + counts[i + 1]
+    rev_idx = array.array("I", bytes(4 * len(fwd_idx)))
+    cursor = list(rev_ptr[:-1])
+    for i in range(len(forward)):
+        for j in fwd_idx[fwd_ptr[i] : fwd_ptr[i + 1]]:
+            rev_idx[cursor[j]] = i
+            cursor[j] += 1
+
+    # name to id hash table, at most half full
+    slots = 1
+    while slots < 2 * len(ids):
+        slots *= 2
+    table = array.array("I", bytes(4 * slots))
+    for i, n in enumerate(names):
+        h = _hash(n, slots)
+        while table[h]:
+            h = (h + 1) & (slots - 1)
+        table[h] = i + 1
+
+    with pathlib.Path(path).open("wb") as f:
+        f.write(
+            INDEX_HEADER.pack(INDEX_MAGIC, len(ids), len(forward), len(fwd_idx), slots)
+        )
+        for a in (offsets, fwd_ptr, rev_ptr, fwd_idx, rev_idx, table):
+            f.write(a.tobytes())
+            f.write(bytes(-len(a) * a.itemsize % 8))
+        for n in names:
+            f.write(n)
+
+
+class GraphIndex:
+    r"""Memory-mapped binary index of objects and dependencies.
+
+    Parameters
+    ----------
+    path : str | pathlib.Path | bytes
+        Path to the index file, as written by `build_index()`, or its content if already
+        read (copied into an anonymous map).
+
+    Attributes
+    ----------
+    nodes : int
+        Number of nodes (objects and dependencies).
+    objects : int
+        Number of objects (nodes `0` to `objects - 1`).
+
+    Notes
+    -----
+    Nothing is read upfront but the header: the pages are loaded by the operating system
+    as the nodes are accessed, such that opening an index and querying it does not
+    depend on its size.
+
+    """
+
+    def __init__(self, path: str | pathlib.Path | bytes) -> None:
+        r"""Open and map the index.
+
+        Parameters
+        ----------
+        path : str | pathlib.Path | bytes
+            Path to the index file, or its content.
+
+        """
+        if isinstance(path, bytes):
+            self._mmap = mmap.mmap(-1, max(len(path), 1))
+            self._mmap.write(path)
+        else:
+            with pathlib.Path(path).open("rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.nodes, self.objects, edges, self._slots = INDEX_HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != INDEX_MAGIC:
+            self._mmap.close()
+            msg = f"Not an index file: {'<bytes>' if isinstance(path, bytes) else path}"
+            raise ValueError(msg)
+
+        # slice the file into its sections
+        self._views: list[memoryview] = [memoryview(self._mmap)]
+        i = INDEX_HEADER.size
+        for attr, fmt, size in (
+            ("_offsets", "Q", self.nodes + 1),
+            ("_fwd_ptr", "Q", self.nodes + 1),
+            ("_rev_ptr", "Q", self.nodes + 1),
+            ("_fwd_idx", "I", edges),
+            ("_rev_idx", "I", edges),
+            ("_table", "I", self._slots),
+        ):
+            j = i + size * struct.calcsize(fmt)
+            self._views.append(self._views[0][i:j].cast(fmt))
+            setattr(self, attr, self._views[-1])
+            i = j + (-j % 8)
+        self._views.append(self._views[0][i:])
+        self._strings = self._views[-1]
+
+    def __enter__(self) -> "Self":
+        r"""Use the index as a context manager.
+
+        Returns
+        -------
+        : GraphIndex
+            The index itself.
+
+        """
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        r"""Close the index when leaving the context."""
+        self.close()
+
+    def close(self) -> None:
+        r"""Release the views and unmap the file."""
+        for v in reversed(self._views):
+            v.release()
+        self._mmap.close()
+
+    def id(self, name: str) -> int | None:
+        r"""Look up the id of a node.
+
+        Parameters
+        ----------
+        name : str
+            Name of the node.
+
+        Returns
+        -------
+        : int | None
+            Id of the node, `None` if not indexed.
+
+        """
+        n = name.encode()
+        h = _hash(n, self._slots)
+
+        while i := self._table[h]:
+            if self._strings[self._offsets[i - 1] : self._offsets[i]] == n:
+                return i - 1
+            h = (h + 1) & (self._slots - 1)
+
+        return None
+
+    def name(self, i: int) -> str:
+        r"""Look up the name of a node.
+
+        Parameters
+        ----------
+        i : int
+            Id of the node.
+
+        Returns
+        -------
+        : str
+            Name of the node.
+
+        """
+        return str(self._strings[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+    def is_object(self, i: int) -> bool:
+        r"""Tell whether a node is an object, or only a dependency.
+
+        Parameters
+        ----------
+        i : int
+            Id of the node.
+
+        Returns
+        -------
+        : bool
+            Whether the node is an object.
+
+        """
+        return i < self.objects
+
+    def parents(self, i: int) -> memoryview:
+        r"""Fetch the upstream dependencies of a node.
+
+        Parameters
+        ----------
+        i : int
+            Id of the node.
+
+        Returns
+        -------
+        : memoryview
+            Ids of the nodes depended on.
+
+        """
+        return self._fwd_idx[self._fwd_ptr[i] : self._fwd_ptr[i + 1]]
+
+    def children(self, i: int) -> memoryview:
+        r"""Fetch the downstream dependencies of a node.
+
+        Parameters
+        ----------
+        i : int
+            Id of the node.
+
+        Returns
+        -------
+        : memoryview
+            Ids of the nodes depending on it.
+
+        """
+        return self._rev_idx[self._rev_ptr[i] : self._rev_ptr[i + 1]]
+
+
+def is_index(path: str | pathlib.Path) -> bool:
+    r"""Check whether a file is a binary index.
+
+    Parameters
+    ----------
+    path : str | pathlib.Path
+        Path to the file.
+
+    Returns
+    -------
+    : bool
+        Whether the file starts with the magic bytes of the index.
+
+    """
+    with pathlib.Path(path).open("rb") as f:
+        return f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+
+
+def read_input(path: str | pathlib.Path) -> GraphIndex | bytes:
+    r"""Open a file if it is an index, or read its content.
+
+    Parameters
+    ----------
+    path : str | pathlib.Path
+        Path to the file, index, JSON or binary.
+
+    Returns
+    -------
+    : GraphIndex | bytes
+        The index, or the content of the file to be provided to `read_graph()`.
+
+    Notes
+    -----
+    The file is read once, such that pipes are supported: only the first bytes of a
+    regular file are peeked at, for an index to be mapped rather than read, while a pipe
+    is read as a whole (and an index copied into memory).
+
+    """
+    with pathlib.Path(path).open("rb") as f:
+        if f.seekable():
+            if f.read(len(INDEX_MAGIC)) == INDEX_MAGIC:
+                return GraphIndex(path)
+            f.seek(0)
+        data = f.read()
+
+    return GraphIndex(data) if data.startswith(INDEX_MAGIC) else data
+
+
+def filter_index(
+    name: str,
+    index: GraphIndex | Graph,
+    direction: str = "upstream",
+    max_depth: int | None = None,
+) -> dict[str, list[str]]:
+    r"""Fetch all objects related to a single object from a binary index.
+
+    Parameters
+    ----------
+    name : str
+        Name of the object to filter for.
+    index : GraphIndex | Graph
+        The index (or in-memory graph) to query.
+    direction : str
+        Fetch the objects `upstream` (depended on), `downstream` (depending on) or
+        `both`.
+    max_depth : int | None
+        Maximum number of hops away from the object, unlimited if `None`.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Filtered list of upstream and downstream dependencies, as `filter_json()`.
+
+    """
+    if direction not in DIRECTIONS:
+        msg = f"Unknown direction: {direction}"
+        raise ValueError(msg)
+
+    if (root := index.id(name)) is None:
+        return {}
+
+    included = _lineage(root, index.parents, index.children, direction, max_depth)
+
+    return {
+        index.name(i): [index.name(d) for d in index.parents(i) if d in included]
+        for i in included
+        if index.is_object(i)
+    }
+
+
+def _batch(
+    roots: list[Hashable],
+    parents: Callable[[Hashable], Iterable[Hashable]],
+    children: Callable[[Hashable], Iterable[Hashable]],
+    direction: str = "upstream",
+    max_depth: int | None = None,
+    union: bool = False,
+) -> list[dict[Hashable, object]]:
+    r"""Fetch the nodes along the lineages of several nodes.
+
+    Parameters
+    ----------
+    roots : list[Hashable]
+        Nodes to start from.
+    parents : Callable[[Hashable], Iterable[Hashable]]
+        Function returning the upstream dependencies of a node.
+    children : Callable[[Hashable], Iterable[Hashable]]
+        Function returning the downstream dependencies of a node.
+    direction : str
+        Fetch the nodes `upstream`, `downstream` or `both`.
+    max_depth : int | None
+        Maximum number of hops away from the nodes, unlimited if `None`.
+    union : bool
+        Whether to fetch the union of the lineages rather than each of them.
+
+    Returns
+    -------
+    : list[dict[Hashable, object]]
+        Nodes reached from each node (itself included), or from any of them.
+
+    """
+    if direction not in DIRECTIONS:
+        msg = f"Unknown direction: {direction}"
+        raise ValueError(msg)
+
+    neighbours = []
+    if direction in ("upstream", "both"):
+        neighbours.append(parents)
+    if direction in ("downstream", "both"):
+        neighbours.append(children)
+
+    # a single traversal from all nodes at once
+    if union:
+        included: dict[Hashable, object] = {}
+        for f in neighbours:
+            included.update(traverse(roots, f, max_depth))
+        return [included]
+
+    # distances depend on the node the traversal starts from, nothing to share
+    if max_depth is not None:
+        return [_lineage(r, parents, children, direction, max_depth) for r in roots]
+
+    # closures shared between nodes
+    memos: list[dict[Hashable, dict[Hashable, None]]] = [{} for _ in neighbours]
+    lineages = []
+    for r in roots:
+        included = {}
+        for f, memo in zip(neighbours, memos):
+            included.update(closure(r, f, memo))
+        lineages.append(included)
+
+    return lineages
+
+
+def filter_batch(
+    names: Iterable[str],
+    objects: dict[str, list[str]],
+    direction: str = "upstream",
+    max_depth: int | None = None,
+    union: bool = False,
+    index: tuple[dict[str, list[str]], dict[str, list[str]]] | None = None,
+) -> dict[str, dict[str, list[str]]] | dict[str, list[str]]:
+    r"""Fetch all objects related to several objects at once.
+
+    Parameters
+    ----------
+    names : Iterable[str]
+        Names of the objects to filter for.
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+    direction : str
+        Fetch the objects `upstream` (depended on), `downstream` (depending on) or
+        `both`.
+    max_depth : int | None
+        Maximum number of hops away from the objects, unlimited if `None`.
+    union : bool
+        Whether to return the union of the lineages rather than each of them.
+    index : tuple[dict[str, list[str]], dict[str, list[str]]] | None
+        Objects indexed in both directions (see `index_json()`), built if not provided.
+
+    Returns
+    -------
+    : dict[str, dict[str, list[str]]] | dict[str, list[str]]
+        Filtered list of upstream and downstream dependencies for each object (as
+        `filter_json()`), or of all of them.
+
+    Notes
+    -----
+    Lineages are computed in a single pass: without `max_depth`, the lineage of an object
+    reached from an object already processed is not walked again (objects shared through
+    objects not filtered for are, see `closure()`).
+
+    """
+    names = list(dict.fromkeys(names))
+    forward, reverse = index_json(objects) if index is None else index
+
+    lineages = [
+        {i: [d for d in forward[i] if d in included] for i in included if i in forward}
+        for included in _batch(
+            names,
+            lambda n: forward.get(n, ()),
+            lambda n: reverse.get(n, ()),
+            direction,
+            max_depth,
+            union,
+        )
+    ]
+
+    return lineages[0] if union else dict(zip(names, lineages))
+
+
+def filter_index_batch(
+    names: Iterable[str],
+    index: GraphIndex | Graph,
+    direction: str = "upstream",
+    max_depth: int | None = None,
+    union: bool = False,
+) -> dict[str, dict[str, list[str]]] | dict[str, list[str]]:
+    r"""Fetch all objects related to several objects at once from a binary index.
+
+    Parameters
+    ----------
+    names : Iterable[str]
+        Names of the objects to filter for.
+    index : GraphIndex | Graph
+        The index (or in-memory graph) to query.
+    direction : str
+        Fetch the objects `upstream` (depended on), `downstream` (depending on) or
+        `both`.
+    max_depth : int | None
+        Maximum number of hops away from the objects, unlimited if `None`.
+    union : bool
+        Whether to return the union of the lineages rather than each of them.
+
+    Returns
+    -------
+    : dict[str, dict[str, list[str]]] | dict[str, list[str]]
+        Filtered list of upstream and downstream dependencies, as `filter_batch()`.
+
+    """
+    names = list(dict.fromkeys(names))
+    ids = {n: i for n in names if (i := index.id(n)) is not None}
+
+    lineages = [
+        {
+            index.name(i): [index.name(d) for d in index.parents(i) if d in included]
+            for i in included
+            if index.is_object(i)
+        }
+        for included in _batch(
+            list(ids.values()),
+            index.parents,
+            index.children,
+            direction,
+            max_depth,
+            union,
+        )
+    ]
+
+    if union:
+        return lineages[0]
+
+    lineages = dict(zip(ids, lineages))
+
+    return {n: lineages.get(n, {}) for n in names}
+
+
 if __name__ == "__main__":
-    n: str = sys.argv[1]
-    o: dict[str, list[str]] = {}
+    # command line arguments
+    if "--direction" in sys.argv:
+        i = sys.argv.index("--direction")
+        direction = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        direction = "upstream"
+
+    if "--max-depth" in sys.argv:
+        i = sys.argv.index("--max-depth")
+        max_depth = int(sys.argv[i + 1])
+        del sys.argv[i : i + 2]
+    else:
+        max_depth = None
+
+    if "--union" in sys.argv:
+        sys.argv.remove("--union")
+        union = True
+    else:
+        union = False
+
+    if "--reduce" in sys.argv:
+        sys.argv.remove("--reduce")
+        reduce = True
+    else:
+        reduce = False
+
+    if "--format" in sys.argv:
+        i = sys.argv.index("--format")
+        fmt = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        fmt = "json"
+
+    if "--compress" in sys.argv:
+        sys.argv.remove("--compress")
+        compress = True
+    else:
+        compress = False
+
+    if "--names-from" in sys.argv:
+        i = sys.argv.index("--names-from")
+        names = pathlib.Path(sys.argv[i + 1]).read_text().split()
+        del sys.argv[i : i + 2]
+    else:
+        names = None
+
+    if "--build-index" in sys.argv:
+        i = sys.argv.index("--build-index")
+        path = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        path = None
+
+    # crash and burn
+    if fmt == "bin" and names is not None and not union:
+        msg = "--format bin requires --union along with --names-from"
+        raise ValueError(msg)
+
+    # object name, unless building the index or several names are provided
+    files = sys.argv[1:] if path is not None or names is not None else sys.argv[2:]
+
+    # read each file once, pipes included
+    inputs = [read_input(a) for a in files]
+    indexes = [a for a, i in zip(files, inputs) if isinstance(i, GraphIndex)]
+
+    # an index holds the whole graph, and cannot be merged with anything
+    if indexes and (len(files) > 1 or path is not None):
+        msg = f"Index {indexes[0]} can only be queried alone, not with other files"
+        raise ValueError(msg)
+
+    # query the prebuilt index
+    if indexes:
+        with inputs[0] as g:
+            if names is not None:
+                r = filter_index_batch(names, g, direction, max_depth, union)
+            else:
+                r = filter_index(sys.argv[1], g, direction, max_depth)
+
+    else:
+        # merge each provided file
+        g = read_graph(inputs)
+
+        # build the index, or filter
+        if path is not None:
+            build_index(g.to_json(), path)
+        elif names is not None:
+            r = filter_index_batch(names, g, direction, max_depth, union)
+        else:
+            r = filter_index(sys.argv[1], g, direction, max_depth)
 
-    # convert ecah provided file
-    for a in sys.argv[2:]:
-        with pathlib.Path(a).open() as f:
-            o = filter_json(a, o)
+    # drop the dependencies implied by others, or report the cycles
+    if path is None:
+        try:
+            if reduce and names is not None and not union:
+                r = {n: transitive_reduction(s) for n, s in r.items()}
+            elif reduce:
+                r = transitive_reduction(r)
+        except CycleError as e:
+            for c in e.cycles:
+                sys.stderr.write(f"{format_cycle(c)}\n")
+            sys.exit(1)
 
-    # filter
-    sys.stdout.write(json.dumps(o))
+        sys.stdout.buffer.write(dump_graph(r, fmt, compress))
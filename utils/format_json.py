@@ -13,74 +13,194 @@ Returns
 Usage
 -----
 ```shell
-$ python script.py <JSON FILE> [<JSON FILE> [...]]
+$ python script.py <JSON FILE> [<JSON FILE> [...]] <--dot|--mmd>
+$ python script.py <JSON FILE> [<JSON FILE> [...]] <--dot|--mmd> --output <FILE>
+$ python script.py <JSON FILE> [...] <--dot|--mmd> [--coarsen <schema|component|scc>]
+$ python script.py <JSON FILE> [...] <--dot|--mmd> [--reduce]
 ```
 
 Example
 -------
 ```shell
-$ python script.py dependencies.json
-$ python script.py file1.json file2.json file3.json
+$ python script.py dependencies.json --mmd
+$ python script.py file1.json file2.json file3.json --dot
+$ python script.py dependencies.json --dot | dot -Tsvg > dependencies.svg
+$ python script.py dependencies.json --mmd --output dependencies.mmd
+$ python script.py dependencies.json --dot --coarsen schema --reduce
+$ python script.py dependencies.bin --mmd
 ```
 
+Note
+----
+* Each dependency is rendered as a link between the object and the object depended
+  upon; the size of the output (and the time it takes) grows linearly with the number
+  of objects and dependencies.
+* The diagram is written as it is rendered, in chunks, to `stdout` or to the file
+  provided via `--output`: it is never held in memory as a whole, and the reading end
+  of a pipe can start processing it right away.
+* Large graphs can be made small enough to be laid out by collapsing objects into
+  groups (`--coarsen`) and/or dropping the dependencies implied by others (`--reduce`)
+  beforehand; see `coarsen_json.py`. Objects depending on each other through a cycle
+  cannot be reduced: the cycles are reported (one line each) on `stderr`, and the
+  script exits with an error.
+* Files in the binary format of `graph.py` are read as well as JSON files (detected
+  from their first bytes).
+
 """
 
-import json
 import pathlib
 import sys
+from collections.abc import Iterable, Iterator
+from typing import TextIO
 
+from coarsen_json import coarsen_json
+from graph import Graph, read_graph
+from reduce_json import CycleError, format_cycle
 
-def to_dot(objects: dict[str, list[str]]) -> str:
-    r"""Convert the JSON content to `DOT` syntax.
+
+def number_nodes(objects: dict[str, list[str]] | Graph) -> dict[str, int]:
+    r"""Number the unique nodes, objects and dependencies alike.
 
     Parameters
     ----------
-    objects : dict[str, list[str]]
-        Dictionary of objects and upstream dependencie.
+    objects : dict[str, list[str]] | Graph
+        Dictionary (or in-memory graph) of objects and upstream dependencies.
 
     Returns
     -------
-    : str
-        `DOT` diagram.
+    : dict[str, int]
+        Nodes and their number (starting at `1`), in order of first appearance.
 
     """
-    d = ""
+    if isinstance(objects, Graph):
+        return {n: i + 1 for i, n in enumerate(objects.names)}
 
-    # build the list of unique nodes
     nodes: dict[str, int] = {}
-    i = 0
+
     for n1, deps in objects.items():
         if n1 not in nodes:
-            i += 1
-            nodes[n1] = i
+            nodes[n1] = len(nodes) + 1
         for n2 in deps:
             if n2 not in nodes:
-                i += 1
-                nodes[n2] = i
+                nodes[n2] = len(nodes) + 1
+
+    return nodes
+
+
+def number_links(
+    objects: dict[str, list[str]] | Graph, nodes: dict[str, int]
+) -> Iterator[tuple[int, int]]:
+    r"""Number both ends of each dependency.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]] | Graph
+        Dictionary (or in-memory graph) of objects and upstream dependencies.
+    nodes : dict[str, int]
+        Nodes and their number, as returned by `number_nodes()`.
+
+    Yields
+    ------
+    : tuple[int, int]
+        Number of the object and of the object depended upon.
+
+    """
+    if isinstance(objects, Graph):
+        for i in objects.iter_objects():
+            for d in objects.parents(i):
+                yield i + 1, d + 1
+    else:
+        for n1, deps in objects.items():
+            for n2 in deps:
+                yield nodes[n1], nodes[n2]
+
+
+def iter_dot(objects: dict[str, list[str]] | Graph) -> Iterator[str]:
+    r"""Convert the JSON content to `DOT` syntax, one line at a time.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]] | Graph
+        Dictionary (or in-memory graph) of objects and upstream dependencies.
+
+    Yields
+    ------
+    : str
+        Lines of the `DOT` diagram, line breaks included.
+
+    """
+    nodes = number_nodes(objects)
+
+    yield "graph {\n"
 
     # nodes
-    d += "  // nodes\n"
-    for i, n in enumerate(nodes):
-        d += f'  node{i} [label"{n}"]\n'
+    yield "  // nodes\n"
+    for n, i in nodes.items():
+        label = n.replace("\\", "\\\\").replace('"', '\\"')
+        yield f'  node{i} [label="{label}"]\n'
 
     # links
-    d += "  // links\n"
-    for n1 in objects:
-        for n2 in objects:
-            d += f"  node{nodes[n1]} -- node{nodes[n2]}\n"
+    yield "  // links\n"
+    for i1, i2 in number_links(objects, nodes):
+        yield f"  node{i1} -- node{i2}\n"
+
+    yield "}\n"
+
+
+def to_dot(objects: dict[str, list[str]] | Graph) -> str:
+    r"""Convert the JSON content to `DOT` syntax.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]] | Graph
+        Dictionary (or in-memory graph) of objects and upstream dependencies.
+
+    Returns
+    -------
+    : str
+        `DOT` diagram.
+
+    """
+    return "".join(iter_dot(objects))
+
+
+def iter_mmd(objects: dict[str, list[str]] | Graph) -> Iterator[str]:
+    r"""Convert the JSON content to `Mermaid` syntax, one line at a time.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]] | Graph
+        Dictionary (or in-memory graph) of objects and upstream dependencies.
+
+    Yields
+    ------
+    : str
+        Lines of the `Mermaid` diagram, line breaks included.
 
-    d += "}"
+    """
+    nodes = number_nodes(objects)
 
-    return f"graph {{\n{d}\n}}"
+    # always top-bottom, manually change it if you want
+    yield "graph TB\n"
 
+    # nodes
+    yield "  %% nodes\n"
+    for n, i in nodes.items():
+        yield f"  node{i}({n})\n"
 
-def to_mmd(objects: dict[str, list[str]]) -> str:
+    # links
+    yield "  %% links\n"
+    for i1, i2 in number_links(objects, nodes):
+        yield f"  node{i1} --- node{i2}\n"
+
+
+def to_mmd(objects: dict[str, list[str]] | Graph) -> str:
     r"""Convert the JSON content to `Mermaid` syntax.
 
     Parameters
     ----------
-    objects : dict[str, list[str]]
-        Dictionary of objects and upstream dependencie.
+    objects : dict[str, list[str]] | Graph
+        Dictionary (or in-memory graph) of objects and upstream dependencies.
 
     Returns
     -------
@@ -88,33 +208,42 @@ def to_mmd(objects: dict[str, list[str]]) -> str:
         `Mermaid` diagram.
 
     """
-    # always top-bottom, manually change it if you want
-    d = "graph TB\n"
+    return "".join(iter_mmd(objects))
 
-    # build the list of unique nodes
-    nodes: dict[str, int] = {}
-    i = 0
-    for n1, deps in objects.items():
-        if n1 not in nodes:
-            i += 1
-            nodes[n1] = i
-        for n2 in deps:
-            if n2 not in nodes:
-                i += 1
-                nodes[n2] = i
 
-    # nodes
-    d += "  %% nodes\n"
-    for i, n in enumerate(nodes):
-        d += f"  node{i}({n})\n"
+def write_lines(lines: Iterable[str], f: TextIO, chunk_size: int = 1 << 16) -> None:
+    r"""Write lines to a file object, in buffered chunks.
 
-    # links
-    d += "  %% links\n"
-    for n1 in objects:
-        for n2 in objects:
-            d += f"  node{nodes[n1]} --- node{nodes[n2]}\n"
+    Parameters
+    ----------
+    lines : Iterable[str]
+        Lines to write, line breaks included.
+    f : TextIO
+        File object to write to.
+    chunk_size : int
+        Approximate number of characters to write at once.
+
+    Notes
+    -----
+    The file object is flushed after each chunk, such that whatever reads from it (a
+    pipe for instance) gets the lines as they are rendered.
 
-    return d
+    """
+    chunk: list[str] = []
+    n = 0
+
+    for line in lines:
+        chunk.append(line)
+        n += len(line)
+
+        if n >= chunk_size:
+            f.write("".join(chunk))
+            f.flush()
+            chunk.clear()
+            n = 0
+
+    f.write("".join(chunk))
+    f.flush()
 
 
 if __name__ == "__main__":
@@ -123,10 +252,30 @@ if __name__ == "__main__":
     # command line arguments
     if "--dot" in sys.argv:
         sys.argv.remove("--dot")
-        func = to_dot
+        func = iter_dot
     if "--mmd" in sys.argv and func is None:
         sys.argv.remove("--mmd")
-        func = to_mmd
+        func = iter_mmd
+
+    if "--coarsen" in sys.argv:
+        i = sys.argv.index("--coarsen")
+        by = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        by = None
+
+    if "--reduce" in sys.argv:
+        sys.argv.remove("--reduce")
+        reduce = True
+    else:
+        reduce = False
+
+    if "--output" in sys.argv:
+        i = sys.argv.index("--output")
+        output = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        output = None
 
     # crash and burn
     if func is None:
@@ -134,6 +283,17 @@ if __name__ == "__main__":
         raise NotImplementedError(msg)
 
     # convert each provided file
-    for a in sys.argv[1:]:
-        with pathlib.Path(a).open() as f:
-            sys.stdout.write(func(json.loads(f.read())))
+    with sys.stdout if output is None else pathlib.Path(output).open("w") as out:
+        for a in sys.argv[1:]:
+            g = read_graph([a])
+
+            # coarsen, or report the cycles
+            if by is not None or reduce:
+                try:
+                    g = coarsen_json(g.to_json(), by, reduce)
+                except CycleError as e:
+                    for c in e.cycles:
+                        sys.stderr.write(f"{format_cycle(c)}\n")
+                    sys.exit(1)
+
+            write_lines(func(g), out)
@@ -0,0 +1,672 @@
+"""Compact in-memory graph of objects and dependencies, shared by the scripts.
+
+Note
+----
+* Names are interned and numbered (in order of first appearance, objects and
+  dependencies alike), and the dependencies of all nodes are stored as 32-bit ids laid
+  end to end in a single array (compressed sparse rows), rather than as lists of names:
+  a fraction of the memory of the equivalent `dict[str, list[str]]`.
+* Dependencies are deduplicated (first occurrence kept) via a set, per node.
+* The interface matches the one of `filter_json.GraphIndex` (`id()`, `name()`,
+  `parents()`, `children()` and `is_object()`), such that queries run against either.
+* Convert from and to the JSON format (`dict[str, list[str]]`) at the edges only, via
+  `Graph.from_json()`, `read_json()` and `Graph.to_json()`.
+* Or skip the JSON (de)serialization altogether between scripts via the compact binary
+  format of `Graph.to_bin()` and `Graph.from_bin()`: `read_graph()` detects which of
+  the two formats a file is in from its first bytes.
+
+"""
+
+import array
+import itertools
+import json
+import operator
+import pathlib
+import struct
+import sys
+import zlib
+from collections.abc import Iterable, Iterator
+
+# magic bytes, flags, number of nodes, number of objects, number of edges
+BIN_HEADER = struct.Struct("<8sBQQQ")
+BIN_MAGIC = b"DEPGRF\x00\x01"
+
+# flag: the content following the header is compressed (`zlib`, fastest level)
+BIN_ZLIB = 1
+
+# signed integer types the arrays are stored as, and their width in bits
+BIN_TYPES = (("b", 8), ("h", 16), ("i", 32), ("q", 64))
+
+# formats the graph can be written in
+FORMATS = ("json", "bin")
+
+
+def _pack(values: Iterable[int], delta: bool = False) -> bytes:
+    r"""Encode integers in the narrowest (signed, little-endian) type that fits them.
+
+    Parameters
+    ----------
+    values : Iterable[int]
+        The integers.
+    delta : bool
+        Whether to store the difference with the previous value rather than the value.
+
+    Returns
+    -------
+    : bytes
+        Type code, number of values and values.
+
+    """
+    values = list(values)
+    if delta:
+        values = list(map(operator.sub, values, itertools.chain((0,), values)))
+
+    lo, hi = min(values, default=0), max(values, default=0)
+    code = next(c for c, b in BIN_TYPES if -(1 << b - 1) <= lo and hi < 1 << b - 1)
+
+    a = array.array(code, values)
+    if sys.byteorder == "big":
+        a.byteswap()
+
+    return struct.pack("<cQ", code.encode(), len(a)) + a.tobytes()
+
+
+def _unpack(data: bytes, offset: int, delta: bool = False) -> tuple[list[int], int]:
+    r"""Decode integers encoded by `_pack()`.
+
+    Parameters
+    ----------
+    data : bytes
+        The encoded content.
+    offset : int
+        Position of the integers in the content.
+    delta : bool
+        Whether the differences with the previous values were stored.
+
+    Returns
+    -------
+    : list[int]
+        The integers.
+    : int
+        Position following them.
+
+    """
+    code, n = struct.unpack_from("<cQ", data, offset)
+    offset += struct.calcsize("<cQ")
+
+    a = array.array(code.decode())
+    a.frombytes(data[offset : offset + n * a.itemsize])
+    if sys.byteorder == "big":
+        a.byteswap()
+
+    return list(itertools.accumulate(a) if delta else a), offset + n * a.itemsize
+
+
+class Graph:
+    r"""Objects and upstream dependencies, names interned and adjacency array-backed.
+
+    Attributes
+    ----------
+    names : list[str]
+        Name of each node (objects and dependencies), by id.
+    ids : dict[str, int]
+        Id of each node, by name.
+
+    Notes
+    -----
+    Dependencies added are appended to a pair of arrays (node, dependency) first; these
+    are sorted by node (counting sort, stable) into the compressed sparse rows on the
+    next query, merged with whatever was there already.
+
+    """
+
+    def __init__(self) -> None:
+        r"""Create an empty graph."""
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+
+        # objects (nodes listed as keys), in order of first appearance
+        self._objects = array.array("I")
+        self._is_object = bytearray()
+
+        # dependencies added since the last query
+        self._src = array.array("I")
+        self._dst = array.array("I")
+
+        # compressed sparse rows, upstream and (built on demand) downstream
+        self._ptr = array.array("Q", [0])
+        self._adj = array.array("I")
+        self._rev_ptr: array.array | None = None
+        self._rev_adj: array.array | None = None
+
+    @property
+    def nodes(self) -> int:
+        r"""Number of nodes (objects and dependencies)."""
+        return len(self.names)
+
+    @property
+    def objects(self) -> int:
+        r"""Number of objects (nodes listed as keys)."""
+        return len(self._objects)
+
+    @property
+    def edges(self) -> int:
+        r"""Number of (unique) dependencies."""
+        self._freeze()
+        return len(self._adj)
+
+    def add_node(self, name: str) -> int:
+        r"""Add a node, if not known yet.
+
+        Parameters
+        ----------
+        name : str
+            Name of the node.
+
+        Returns
+        -------
+        : int
+            Id of the node.
+
+        """
+        if (i := self.ids.get(name)) is None:
+            i = self.ids[sys.intern(name)] = len(self.names)
+            self.names.append(name)
+            self._is_object.append(0)
+
+        return i
+
+    def add(self, name: str, deps: Iterable[str] = ()) -> int:
+        r"""Add an object and (some of) its dependencies.
+
+        Parameters
+        ----------
+        name : str
+            Name of the object.
+        deps : Iterable[str]
+            Names of the dependencies, appended to the ones already known.
+
+        Returns
+        -------
+        : int
+            Id of the object.
+
+        """
+        i = self.add_node(name)
+
+        if not self._is_object[i]:
+            self._is_object[i] = 1
+            self._objects.append(i)
+
+        for d in deps:
+            self._src.append(i)
+            self._dst.append(self.add_node(d))
+
+        return i
+
+    def _freeze(self) -> None:
+        r"""Sort the dependencies added since the last query into the sparse rows."""
+        if len(self._ptr) == len(self.names) + 1 and not self._src:
+            return
+
+        n = len(self.names)
+        old = len(self._ptr) - 1
+
+        # number of dependencies of each node, known and added
+        ptr = [0] * (n + 1)
+        for i in range(old):
+            ptr[i + 1] = self._ptr[i + 1] - self._ptr[i]
+        for i in self._src:
+            ptr[i + 1] += 1
+        for i in range(n):
+            ptr[i + 1] += ptr[i]
+
+        # known dependencies first, then the ones added, in order
+        adj = array.array("I", bytes(4 * ptr[n]))
+        fill = ptr[:-1]
+        for i in range(old):
+            j, k = self._ptr[i], self._ptr[i + 1]
+            adj[fill[i] : fill[i] + k - j] = self._adj[j:k]
+            fill[i] += k - j
+        for i, d in zip(self._src, self._dst):
+            adj[fill[i]] = d
+            fill[i] += 1
+
+        # deduplicate, first occurrence kept
+        self._ptr = array.array("Q", [0])
+        self._adj = array.array("I")
+        for i in range(n):
+            row = adj[ptr[i] : ptr[i + 1]]
+            self._adj.extend(dict.fromkeys(row) if len(row) > 1 else row)
+            self._ptr.append(len(self._adj))
+
+        self._src = array.array("I")
+        self._dst = array.array("I")
+        self._rev_ptr = self._rev_adj = None
+
+    def _reverse(self) -> None:
+        r"""Build the downstream sparse rows (counting sort of the upstream ones)."""
+        self._freeze()
+
+        n = len(self.names)
+        ptr = [0] * (n + 1)
+        for d in self._adj:
+            ptr[d + 1] += 1
+        for i in range(n):
+            ptr[i + 1] += ptr[i]
+
+        # objects in order of first appearance, as filter_json.index_json()
+        adj = array.array("I", bytes(4 * ptr[n]))
+        fill = ptr[:-1]
+        for i in self._objects:
+            for d in self._adj[self._ptr[i] : self._ptr[i + 1]]:
+                adj[fill[d]] = i
+                fill[d] += 1
+
+        self._rev_ptr = array.array("Q", ptr)
+        self._rev_adj = adj
+
+    def id(self, name: str) -> int | None:
+        r"""Look up the id of a node.
+
+        Parameters
+        ----------
+        name : str
+            Name of the node.
+
+        Returns
+        -------
+        : int | None
+            Id of the node, `None` if not in the graph.
+
+        """
+        return self.ids.get(name)
+
+    def name(self, i: int) -> str:
+        r"""Look up the name of a node.
+
+        Parameters
+        ----------
+        i : int
+            Id of the node.
+
+        Returns
+        -------
+        : str
+            Name of the node.
+
+        """
+        return self.names[i]
+
+    def is_object(self, i: int) -> bool:
+        r"""Tell whether a node is an object, or only a dependency.
+
+        Parameters
+        ----------
+        i : int
+            Id of the node.
+
+        Returns
+        -------
+        : bool
+            Whether the node is an object.
+
+        """
+        return bool(self._is_object[i])
+
+    def parents(self, i: int) -> memoryview:
+        r"""Fetch the upstream dependencies of a node.
+
+        Parameters
+        ----------
+        i : int
+            Id of the node.
+
+        Returns
+        -------
+        : memoryview
+            Ids of the nodes depended on.
+
+        """
+        self._freeze()
+        return memoryview(self._adj)[self._ptr[i] : self._ptr[i + 1]]
+
+    def children(self, i: int) -> memoryview:
+        r"""Fetch the downstream dependencies of a node.
+
+        Parameters
+        ----------
+        i : int
+            Id of the node.
+
+        Returns
+        -------
+        : memoryview
+            Ids of the nodes depending on it.
+
+        """
+        if self._rev_adj is None or self._src:
+            self._reverse()
+        return memoryview(self._rev_adj)[self._rev_ptr[i] : self._rev_ptr[i + 1]]
+
+    def iter_objects(self) -> Iterator[int]:
+        r"""Iterate over the objects.
+
+        Yields
+        ------
+        : int
+            Id of each object, in order of first appearance as such.
+
+        """
+        yield from self._objects
+
+    @classmethod
+    def from_json(cls, objects: dict[str, list[str]]) -> "Graph":
+        r"""Convert the JSON content.
+
+        Parameters
+        ----------
+        objects : dict[str, list[str]]
+            Dictionary of objects and upstream dependencies.
+
+        Returns
+        -------
+        : Graph
+            The graph.
+
+        """
+        g = cls()
+        for n, deps in objects.items():
+            g.add(n, deps)
+
+        return g
+
+    def to_json(self) -> dict[str, list[str]]:
+        r"""Convert to JSON content.
+
+        Returns
+        -------
+        : dict[str, list[str]]
+            Dictionary of objects and upstream dependencies.
+
+        """
+        return {
+            self.names[i]: [self.names[d] for d in self.parents(i)]
+            for i in self._objects
+        }
+
+    def to_bin(self, compress: bool = False) -> bytes:
+        r"""Convert to the binary format.
+
+        Parameters
+        ----------
+        compress : bool
+            Whether to compress the content (via `zlib`).
+
+        Returns
+        -------
+        : bytes
+            The binary content.
+
+        Raises
+        ------
+        ValueError
+            If a name embeds a null character (the separator of the string table).
+
+        Notes
+        -----
+        The content consists of (all integers little-endian):
+
+        * A header: magic bytes, flags (whether the rest is compressed), number of nodes,
+          of objects and of edges.
+        * The string table: size, then UTF-8 encoded names separated by null characters.
+        * The ids of the objects, in order of first appearance as such.
+        * The number of dependencies of each node.
+        * The ids of the dependencies of all nodes, end to end.
+
+        Nodes are numbered again in order of first appearance in the JSON content (each
+        object followed by its dependencies), for the graph read back to be the one read
+        from the JSON content; ids are then stored as the difference with the previous
+        one (small, as ids of related nodes are close), each array in the narrowest type
+        that fits its values.
+
+        """
+        self._freeze()
+
+        n = len(self.names)
+
+        # ids as if read from the JSON content, old ids in new order
+        seen = array.array("I")
+        for i in self._objects:
+            seen.append(i)
+            seen.extend(self._adj[self._ptr[i] : self._ptr[i + 1]])
+        order = dict.fromkeys(seen)
+        order.update(dict.fromkeys(range(n)))
+        perm = list(order)
+
+        if perm == list(range(n)):
+            objects, ptr, adj = self._objects, self._ptr, self._adj
+        else:
+            ids = [0] * n
+            for k, i in enumerate(perm):
+                ids[i] = k
+            objects = array.array("I", map(ids.__getitem__, self._objects))
+            ptr = array.array("Q", [0])
+            adj = array.array("I")
+            for i in perm:
+                adj.extend(self._adj[self._ptr[i] : self._ptr[i + 1]])
+                ptr.append(len(adj))
+            adj = array.array("I", map(ids.__getitem__, adj))
+
+        names = "\x00".join([self.names[i] for i in perm]).encode()
+        if names.count(b"\x00") != max(0, n - 1):
+            msg = "Names cannot embed null characters"
+            raise ValueError(msg)
+
+        content = b"".join(
+            (
+                struct.pack("<Q", len(names)),
+                names,
+                _pack(objects, delta=True),
+                _pack(map(operator.sub, ptr[1:], ptr)),
+                _pack(adj, delta=True),
+            )
+        )
+
+        header = BIN_HEADER.pack(
+            BIN_MAGIC,
+            BIN_ZLIB if compress else 0,
+            len(self.names),
+            len(self._objects),
+            len(self._adj),
+        )
+
+        return header + (zlib.compress(content, 1) if compress else content)
+
+    @classmethod
+    def from_bin(cls, data: bytes) -> "Graph":
+        r"""Convert the binary content.
+
+        Parameters
+        ----------
+        data : bytes
+            The binary content, as returned by `Graph.to_bin()`.
+
+        Returns
+        -------
+        : Graph
+            The graph.
+
+        Raises
+        ------
+        ValueError
+            If the content does not start with the magic bytes of the format.
+
+        """
+        magic, flags, nodes, objects, edges = BIN_HEADER.unpack_from(data)
+        if magic != BIN_MAGIC:
+            msg = "Not a binary graph"
+            raise ValueError(msg)
+
+        content = data[BIN_HEADER.size :]
+        if flags & BIN_ZLIB:
+            content = zlib.decompress(content)
+
+        (size,) = struct.unpack_from("<Q", content)
+        offset = 8 + size
+        names = content[8:offset].decode().split("\x00") if nodes else []
+
+        ids, offset = _unpack(content, offset, delta=True)
+        degrees, offset = _unpack(content, offset)
+        adj, offset = _unpack(content, offset, delta=True)
+
+        if (len(names), len(ids), len(adj)) != (nodes, objects, edges):
+            msg = "Truncated binary graph"
+            raise ValueError(msg)
+
+        g = cls()
+        g.names = list(map(sys.intern, names))
+        g.ids = dict(zip(g.names, range(nodes)))
+        g._objects = array.array("I", ids)
+        g._is_object = bytearray(nodes)
+        for i in ids:
+            g._is_object[i] = 1
+        g._ptr = array.array("Q", itertools.accumulate(degrees, initial=0))
+        g._adj = array.array("I", adj)
+
+        return g
+
+
+def read_json(paths: Iterable[str | pathlib.Path], graph: Graph | None = None) -> Graph:
+    r"""Read and merge JSON files.
+
+    Parameters
+    ----------
+    paths : Iterable[str | pathlib.Path]
+        Path to the JSON file(s).
+    graph : Graph | None
+        Graph to merge the files into, a new one if `None`.
+
+    Returns
+    -------
+    : Graph
+        The graph; objects listed in several files see their dependencies merged (first
+        occurrence kept).
+
+    Notes
+    -----
+    Each file is converted (and its JSON content released) before the next is read.
+
+    """
+    graph = Graph() if graph is None else graph
+
+    for a in paths:
+        with pathlib.Path(a).open() as f:
+            for n, deps in json.load(f).items():
+                graph.add(n, deps)
+
+    return graph
+
+
+def is_bin(path: str | pathlib.Path) -> bool:
+    r"""Check whether a file is in the binary format.
+
+    Parameters
+    ----------
+    path : str | pathlib.Path
+        Path to the file.
+
+    Returns
+    -------
+    : bool
+        Whether the file starts with the magic bytes of the format.
+
+    """
+    with pathlib.Path(path).open("rb") as f:
+        return f.read(len(BIN_MAGIC)) == BIN_MAGIC
+
+
+def read_graph(
+    paths: Iterable[str | pathlib.Path | bytes], graph: Graph | None = None
+) -> Graph:
+    r"""Read and merge files, JSON or binary.
+
+    Parameters
+    ----------
+    paths : Iterable[str | pathlib.Path | bytes]
+        Path to the file(s), in either format (detected from the first bytes), or their
+        content if already read.
+    graph : Graph | None
+        Graph to merge the files into, a new one if `None`.
+
+    Returns
+    -------
+    : Graph
+        The graph, as `read_json()`.
+
+    Notes
+    -----
+    Each file is read once (pipes are supported), and converted before the next is.
+
+    """
+    for a in paths:
+        data = a if isinstance(a, bytes) else pathlib.Path(a).read_bytes()
+
+        if not data.startswith(BIN_MAGIC):
+            graph = Graph() if graph is None else graph
+            for n, deps in json.loads(data).items():
+                graph.add(n, deps)
+            continue
+
+        g = Graph.from_bin(data)
+
+        # first file taken as is, the following ones merged
+        if graph is None:
+            graph = g
+        else:
+            for i in g.iter_objects():
+                graph.add(g.names[i], [g.names[d] for d in g.parents(i)])
+
+    return Graph() if graph is None else graph
+
+
+def dump_graph(
+    objects: dict[str, list[str]] | Graph,
+    fmt: str = "json",
+    compress: bool = False,
+    indent: int | None = None,
+) -> bytes:
+    r"""Serialize objects and dependencies.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]] | Graph
+        Dictionary (or in-memory graph) of objects and upstream dependencies.
+    fmt : str
+        Format to write, `json` or `bin`.
+    compress : bool
+        Whether to compress the binary content.
+    indent : int | None
+        Indentation of the JSON content.
+
+    Returns
+    -------
+    : bytes
+        The content.
+
+    Raises
+    ------
+    ValueError
+        If the format is not known.
+
+    """
+    if fmt == "bin":
+        g = objects if isinstance(objects, Graph) else Graph.from_json(objects)
+        return g.to_bin(compress)
+
+    if fmt == "json":
+        o = objects.to_json() if isinstance(objects, Graph) else objects
+        return json.dumps(o, indent=indent).encode()
+
+    msg = f"Unknown format {fmt}, expected one of {', '.join(FORMATS)}"
+    raise ValueError(msg)
@@ -0,0 +1,150 @@
+"""Split the objects of a JSON object into levels, to schedule their (re)builds.
+
+Parameters
+----------
+: str
+    Path to the JSON file(s).
+
+Returns
+-------
+: str
+    JSON-formatted object listing the objects of each level, the number of objects of
+    each level, and the critical path (longest chain of dependencies).
+
+Usage
+-----
+```shell
+$ python script.py <JSON FILE> [<JSON FILE> [...]]
+```
+
+Example
+-------
+```shell
+$ python script.py dependencies.json
+$ python script.py file1.json file2.json file3.json
+```
+
+Note
+----
+* Objects without upstream dependencies are on level 0, the others one level above
+  their highest dependency: all objects of a level can be built concurrently once the
+  levels below are, the number of objects of the widest level being the most builds
+  that can ever run at the same time.
+* Only the objects (keys of the JSON object) are levelled and counted: dependencies
+  that are not objects themselves (source tables) are not built, and are left out. An
+  object only depending on such sources is on level 0.
+* The critical path lists the objects of the longest chain of dependencies, upstream
+  first: the number of levels (its length) is the least number of successive builds.
+* Objects depending on each other through a cycle cannot be ordered: the cycles are
+  reported (one line each) on `stderr`, and the script exits with an error.
+* Files in the binary format of `graph.py` are read as well as JSON files (detected
+  from their first bytes).
+
+"""
+
+import json
+import sys
+
+from graph import read_graph
+from reduce_json import CycleError, find_cycles, format_cycle, topological_order
+
+
+def levels_json(objects: dict[str, list[str]]) -> tuple[dict[str, int], list[str]]:
+    r"""Compute the level of each node, and the critical path.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies, without cycle.
+
+    Returns
+    -------
+    : dict[str, int]
+        Level of each object, in topological order; dependencies that are not objects
+        are left out.
+    : list[str]
+        Longest chain of objects, upstream first.
+
+    Raises
+    ------
+    CycleError
+        If objects depend on each other through a cycle.
+
+    Notes
+    -----
+    Objects are processed in topological order (without recursion, for long lineages not
+    to hit the recursion limit), each one level above its highest dependency among the
+    objects; that dependency is recorded to walk the critical path back from the
+    highest object.
+
+    """
+    order, children = topological_order(objects)
+
+    if len(order) < len(children):
+        raise CycleError(find_cycles(objects))
+
+    levels: dict[str, int] = {}
+    highest: dict[str, str] = {}
+
+    for n in order:
+        if n not in objects:
+            continue
+        levels[n] = 0
+        for d in objects[n]:
+            if d in levels and levels[d] >= levels[n]:
+                levels[n] = levels[d] + 1
+                highest[n] = d
+
+    # walk the longest chain back
+    path = [max(levels, key=levels.__getitem__)] if levels else []
+    while path and path[-1] in highest:
+        path.append(highest[path[-1]])
+
+    return levels, path[::-1]
+
+
+def group_levels(levels: dict[str, int]) -> list[list[str]]:
+    r"""List the nodes of each level.
+
+    Parameters
+    ----------
+    levels : dict[str, int]
+        Level of each node.
+
+    Returns
+    -------
+    : list[list[str]]
+        Nodes of each level, lowest first.
+
+    """
+    grouped: list[list[str]] = [[] for _ in range(max(levels.values(), default=-1) + 1)]
+
+    for n, l in levels.items():
+        grouped[l].append(n)
+
+    return grouped
+
+
+if __name__ == "__main__":
+    # merge each provided file
+    o = read_graph(sys.argv[1:]).to_json()
+
+    # order, or report the cycles
+    try:
+        levels, path = levels_json(o)
+    except CycleError as e:
+        for c in e.cycles:
+            sys.stderr.write(f"{format_cycle(c)}\n")
+        sys.exit(1)
+
+    # output
+    grouped = group_levels(levels)
+    sys.stdout.write(
+        json.dumps(
+            {
+                "levels": grouped,
+                "widths": [len(g) for g in grouped],
+                "critical_path": path,
+            }
+        )
+    )
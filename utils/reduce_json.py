@@ -0,0 +1,258 @@
+"""Drop the dependencies implied by others from a JSON object (transitive reduction).
+
+Parameters
+----------
+: str
+    Path to the JSON file(s).
+
+Returns
+-------
+: str
+    JSON-formatted, nested list of object and upstream dependencies, without the
+    dependencies reachable through another one.
+
+Usage
+-----
+```shell
+$ python script.py <JSON FILE> [<JSON FILE> [...]]
+$ python script.py <JSON FILE> [<JSON FILE> [...]] --format <json|bin> [--compress]
+```
+
+Example
+-------
+```shell
+$ python script.py dependencies.json
+$ python script.py file1.json file2.json file3.json
+```
+
+Note
+----
+* `A -> C` is dropped if `A -> B -> C`: the output has the exact same lineages, with
+  as few links as possible.
+* Objects depending on each other through a cycle cannot be reduced: the cycles are
+  reported (one line each) on `stderr`, and the script exits with an error.
+* Files in the binary format of `graph.py` are read as well as JSON files (detected
+  from their first bytes), and `--format bin` writes the output in that format
+  (`--compress`ed if requested).
+
+"""
+
+import sys
+
+from graph import dump_graph, read_graph
+
+
+class CycleError(ValueError):
+    r"""Objects depend on each other through one or more cycles.
+
+    Parameters
+    ----------
+    cycles : list[list[str]]
+        Cycles not sharing any object, each listing objects depending on the next, the
+        last one on the first.
+
+    """
+
+    def __init__(self, cycles: list[list[str]]) -> None:
+        r"""Store the cycles along with a readable message.
+
+        Parameters
+        ----------
+        cycles : list[list[str]]
+            The cycles.
+
+        """
+        self.cycles = cycles
+        super().__init__(f"{len(cycles)} cycle(s) found: {format_cycle(cycles[0])}")
+
+
+def format_cycle(cycle: list[str]) -> str:
+    r"""Format a cycle for display.
+
+    Parameters
+    ----------
+    cycle : list[str]
+        Objects involved, each depending on the next, the last one on the first.
+
+    Returns
+    -------
+    : str
+        The cycle as `a -> b -> ... -> a`.
+
+    """
+    return " -> ".join([*cycle, cycle[0]])
+
+
+def topological_order(
+    objects: dict[str, list[str]],
+) -> tuple[list[str], dict[str, list[str]]]:
+    r"""Order the objects such that each comes after all its dependencies.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : list[str]
+        Nodes (objects and dependencies alike) in topological order, dependencies first;
+        those involved in or depending on a cycle are left out.
+    : dict[str, list[str]]
+        Nodes and downstream dependencies (objects depending on them).
+
+    Notes
+    -----
+    Kahn's algorithm, iterative.
+
+    """
+    pending: dict[str, int] = {}
+    children: dict[str, list[str]] = {}
+
+    for n, deps in objects.items():
+        deps = dict.fromkeys(deps)
+        pending[n] = len(deps)
+        children.setdefault(n, [])
+        for d in deps:
+            pending.setdefault(d, 0)
+            children.setdefault(d, []).append(n)
+
+    order = [n for n, p in pending.items() if not p]
+    for n in order:
+        for c in children[n]:
+            pending[c] -= 1
+            if not pending[c]:
+                order.append(c)
+
+    return order, children
+
+
+def find_cycles(objects: dict[str, list[str]]) -> list[list[str]]:
+    r"""Find the cycles objects depend on each other through.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : list[list[str]]
+        Cycles not sharing any object, each listing objects depending on the next, the
+        last one on the first.
+
+    Notes
+    -----
+    Each object left out of the topological order has at least one dependency left out
+    as well: following those from any of them always ends up looping.
+
+    """
+    order, _ = topological_order(objects)
+    done = set(order)
+    seen: set[str] = set()
+    cycles = []
+
+    for start in objects:
+        if start in done or start in seen:
+            continue
+
+        # walk up until looping, or reaching an object already walked through
+        path: dict[str, None] = {}
+        n = start
+        while n not in seen:
+            seen.add(n)
+            path[n] = None
+            n = next(d for d in objects[n] if d not in done)
+
+        if n in path:
+            p = list(path)
+            cycles.append(p[p.index(n) :])
+
+    return cycles
+
+
+def transitive_reduction(objects: dict[str, list[str]]) -> dict[str, list[str]]:
+    r"""Drop the dependencies implied by others.
+
+    Parameters
+    ----------
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies, without cycle.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies not reachable through another.
+
+    Raises
+    ------
+    CycleError
+        If objects depend on each other through a cycle.
+
+    Notes
+    -----
+    Nodes are processed in topological order, dependencies first, each carrying the set
+    of nodes upstream of it as a bitset (a Python integer, bit `i` standing for the
+    `i`-th node in that order): a dependency is redundant if upstream of any of the
+    dependencies. The set of a node is dropped as soon as all nodes depending on it are
+    processed.
+
+    """
+    order, children = topological_order(objects)
+
+    if len(order) < len(children):
+        raise CycleError(find_cycles(objects))
+
+    index = {n: i for i, n in enumerate(order)}
+    remaining = {n: len(c) for n, c in children.items()}
+    upstream: dict[str, int] = {}
+    reduced: dict[str, list[str]] = {}
+
+    for n in order:
+        deps = list(dict.fromkeys(objects.get(n, ())))
+
+        u = 0
+        for d in deps:
+            u |= upstream[d]
+
+        if n in objects:
+            reduced[n] = [d for d in deps if not u & (1 << index[d])]
+
+        # dependencies are upstream too
+        for d in deps:
+            u |= 1 << index[d]
+            remaining[d] -= 1
+            if not remaining[d]:
+                del upstream[d]
+
+        if remaining[n]:
+            upstream[n] = u
+
+    return {n: reduced[n] for n in objects}
+
+
+if __name__ == "__main__":
+    # command line arguments
+    if "--format" in sys.argv:
+        i = sys.argv.index("--format")
+        fmt = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        fmt = "json"
+
+    if "--compress" in sys.argv:
+        sys.argv.remove("--compress")
+        compress = True
+    else:
+        compress = False
+
+    # merge each provided file
+    o = read_graph(sys.argv[1:]).to_json()
+
+    # reduce, or report the cycles
+    try:
+        sys.stdout.buffer.write(dump_graph(transitive_reduction(o), fmt, compress))
+    except CycleError as e:
+        for c in e.cycles:
+            sys.stderr.write(f"{format_cycle(c)}\n")
+        sys.exit(1)
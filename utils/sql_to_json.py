@@ -16,13 +16,31 @@ Usage
 ```shell
 $ python script.py <SQL FILE> [<SQL FILE> [...]]
 $ python script.py <SQL FILE> [<SQL FILE> [...]] --pretty
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --format <json|bin> [--compress]
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --jobs <N>
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --cache-dir <DIR> [--cache-size <N>]
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --sqlparse
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --ndjson
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --state <FILE> [--affected <FILE>]
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --watch --output <FILE>
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --profile [--profile-top <N>]
+$ python script.py <SQL FILE> [<SQL FILE> [...]] --trace <FILE> [--pstats <FILE>]
+$ python script.py <SQL FILE> [...] --timeout <SECONDS> --max-size <N> [--quarantine <FILE>]
 ```
 
 Example
 -------
 ```shell
 $ python script.py view.sql --pretty
+$ python script.py models/**/*.sql --format bin --compress > dependencies.bin
 $ python script.py fact_*.sql dim_*.sql
+$ python script.py models/**/*.sql --jobs 8
+$ python script.py models/**/*.sql --cache-dir .cache
+$ python script.py models/**/*.sql --ndjson | python loader.py
+$ python script.py models/**/*.sql --state .state.json --affected affected.txt
+$ python script.py models/**/*.sql --watch --output dependencies.json
+$ python script.py models/**/*.sql --profile --trace trace.json > /dev/null
+$ python script.py models/**/*.sql --timeout 5 --max-size 1000000 --quarantine bad.json
 ```
 
 Note
@@ -32,25 +50,221 @@ Note
 * This is based on queries running on `Redshift`, no guarantees this would work on any
   other syntax (but `Redshift` is largely based on `PostgreSQL`, there's hope).
 * This little stunt is still in alpha, and a lot more testing is required!
+* The dependencies of all statements of all files are merged in a single JSON object;
+  `--jobs` spreads the statements over `N` worker processes (all available cores if
+  `0`) without altering the output.
+* `--format bin` writes the objects and dependencies in a compact binary format instead
+  (`--compress`ed via `zlib` if requested), read by the other scripts (much) faster
+  than JSON; see `graph.py`, and `bin_to_json.py` to convert it back.
+* `--cache-dir` stores the dependencies extracted from each statement in a `SQLite`
+  database, keyed by the content of the statement; unchanged statements are not parsed
+  again on the next run. The cache is trimmed to the `--cache-size` (default 100,000)
+  most recently used statements, and a hits/misses line is reported on `stderr`.
+* Scripts are split in statements, and comments stripped, by a lightweight lexer
+  (quotes, dollar-quoting and comments aware); `--sqlparse` falls back on
+  [`sqlparse`](https://github.com/andialbrecht/sqlparse) instead, slower but more
+  thorough.
+* `--ndjson` streams one `{"object": ..., "parents": [...], "source": ...}` record per
+  line instead, as soon as the statement defining the object is parsed (objects are
+  not merged across statements in this mode).
+* `--state` keeps the dependencies extracted from each file (along with its
+  modification time, size and hash) and the merged output in a JSON file: only the
+  files changed since the previous run are parsed again, the output being identical to
+  a full run. The objects added, removed or whose dependencies changed, and all objects
+  downstream of them, are counted on `stderr` and listed (one per line) in the
+  `--affected` file if provided, ready for `filter_json.py --names-from`.
+* `--watch` keeps running (until interrupted), and rewrites the `--output` file (at
+  once) each time the files provided change; only the statements changed are parsed
+  again. Changes are caught via `inotify` on Linux, by polling the files every half a
+  second otherwise. Files created afterwards are not picked up. `--sqlparse` and
+  `--profile` apply as well, the profile being reported once interrupted.
+* `--profile` (or the `SQL_TO_JSON_PROFILE` environment variable set to a non-empty
+  value) records the time spent and the peak memory allocated in each stage of the
+  pipeline, for each file, and reports (on `stderr`) a histogram of the durations of
+  each stage and the `--profile-top` (default 10) slowest files. Everything is then
+  processed in the current process (`--jobs` is ignored). `--trace` exports the
+  records in the `Chrome` trace event format (and implies `--profile`), `--pstats` the
+  `cProfile` statistics of the whole run.
+* `--timeout` (in seconds) and `--max-size` (in characters) limit each statement: those
+  taking longer to process (interrupted via `SIGALRM`, unavailable on Windows) or
+  longer than that are set aside rather than stalling or failing the whole run. They
+  are counted on `stderr`, and reported in the `--quarantine` file (JSON) if provided.
 
 """
 
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import itertools
 import json
+import os
 import pathlib
 import re
+import signal
+import sqlite3
+import struct
 import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+
+from filter_json import traverse
+from graph import Graph, dump_graph
+
+# bump whenever the parsing logic changes the output, to invalidate cached results
+PARSER_VERSION = "1"
+
+# upper bounds (in seconds) of the buckets of the profiling histogram, last one open
+HISTOGRAM_BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1, float("inf"))
+
+# keywords the case of which is lowered by the built-in lexer
+KEYWORDS = (
+    "all", "and", "as", "asc", "auto", "backup", "between", "by", "case", "cast",
+    "compound", "create", "cross", "delete", "desc", "distinct", "distkey",
+    "diststyle", "else", "end", "even", "except", "exists", "external", "extract",
+    "format", "from", "full", "group", "having", "if", "ilike", "in", "inner",
+    "inputformat", "insert", "interleaved", "intersect", "into", "is", "join", "key",
+    "lateral", "left", "like", "limit", "location", "materialized", "minus",
+    "natural", "no", "not", "null", "offset", "on", "or", "order", "outer",
+    "outputformat", "over", "partition", "recursive", "replace", "right", "row",
+    "select", "serde", "set", "sortkey", "stored", "table", "temp", "temporary",
+    "then", "trim", "union", "update", "using", "values", "view", "when", "where",
+    "window", "with",
+)  # fmt: skip
+
+# lexing of the scripts: comments, quoted strings/identifiers (dollar-quoting included)
+_COMMENT = r"--[^\n]*|/\*[\s\S]*?(?:\*/|\Z)"
+_QUOTED = (
+    r"'(?:[^'\\]|\\[\s\S]|'')*'?"
+    r'|"(?:[^"]|"")*"?'
+    r"|`[^`]*`?"
+    r"|(?P<tag>(?<![\w$])\$(?:[A-Za-z_]\w*)?\$)[\s\S]*?(?:(?P=tag)|\Z)"
+)
+_STATEMENTS = re.compile(rf"(?P<skip>{_COMMENT}|{_QUOTED})|;")
+_FORMAT = re.compile(
+    rf"(?P<comment>{_COMMENT})|(?P<quoted>{_QUOTED})"
+    rf"|(?P<keyword>(?i:(?<![\w$])(?:{'|'.join(KEYWORDS)})(?![\w$])))"
+)
+
+# cleaning of the queries
+_INLINE_COMMENT = re.compile("--.*")
+_PARAMETERS = str.maketrans({"(": " ( ", ",": " , ", ")": " ) "})
+_DESCRIPTOR = re.compile(r"(?<![A-Za-z0-9_])([A-Za-z0-9_]+)\s*\.\s*([A-Za-z0-9_]+)")
+_NONSPACE = re.compile(r"\S")
+_WORD = re.compile(r"\S+")
+
+# regular expression to catch subqueries
+_SUBQUERY = re.compile(r"([^\s]+)(\s+as\s+)(\(\s+select)")
+
+# regular expression to hide the selected columns
+_COLUMNS = re.compile(r"select\s+(.*?)\s+from")
+
+
+def split_statements(content: str, use_sqlparse: bool = False) -> list[str]:
+    r"""Split a script in its statements.
 
-import sqlparse
+    Parameters
+    ----------
+    content : str
+        The SQL script.
+    use_sqlparse : bool
+        Whether to rely on `sqlparse` rather than the built-in lexer.
+
+    Returns
+    -------
+    : list[str]
+        Statements (stripped, but including their final semicolumn), empty ones left
+        out.
+
+    Notes
+    -----
+    Semicolumns within comments, quoted strings or identifiers, and dollar-quoted
+    bodies (`$$ ... $$`, `$tag$ ... $tag$`) do not end a statement.
+
+    """
+    if use_sqlparse:
+        import sqlparse  # only imported if requested, slow to load
+
+        return [s for s in sqlparse.split(content) if s.strip(" ;")]
+
+    statements = []
+    i = 0
+
+    # iterate over the relevant bits only, the rest is skipped by the engine
+    for m in _STATEMENTS.finditer(content):
+        if m.lastgroup is None:
+            statements.append(content[i : m.end()].strip())
+            i = m.end()
+    statements.append(content[i:].strip())
+
+    return [s for s in statements if s.strip(" ;")]
+
+
+def format_query(query: str, use_sqlparse: bool = False) -> str:
+    r"""Strip the comments from a query, and lower the case of its keywords.
+
+    Parameters
+    ----------
+    query : str
+        The SQL query.
+    use_sqlparse : bool
+        Whether to rely on `sqlparse` rather than the built-in lexer.
+
+    Returns
+    -------
+    : str
+        Formatted (and stripped) query.
+
+    Notes
+    -----
+    The built-in lexer only knows about the keywords listed in `KEYWORDS`; `sqlparse`
+    knows a lot more, but identifiers matching any of these see their case lowered too.
+    Quoted strings and identifiers are left untouched either way.
+
+    """
+    if use_sqlparse:
+        import sqlparse  # only imported if requested, slow to load
+
+        return sqlparse.format(query, keyword_case="lower", strip_comments=True)
 
+    return _FORMAT.sub(_format, query).strip()
 
-def clean_query(query: str) -> str:
-    r"""Deep-cleaning of a SQL query via
-    [`sqlparse`](https://github.com/andialbrecht/sqlparse) and regular expressions.
+
+def _format(m: re.Match) -> str:
+    r"""Format a single token matched by the lexer.
+
+    Parameters
+    ----------
+    m : re.Match
+        Comment, quoted string/identifier or keyword.
+
+    Returns
+    -------
+    : str
+        A space for comments, the lowercased keyword, or the quoted bit untouched.
+
+    """
+    if m.lastgroup == "comment":
+        return " "
+    if m.lastgroup == "keyword":
+        return m.group().lower()
+
+    return m.group()
+
+
+def clean_query(query: str, use_sqlparse: bool = False) -> str:
+    r"""Deep-cleaning of a SQL query via a lightweight lexer (or
+    [`sqlparse`](https://github.com/andialbrecht/sqlparse)) and regular expressions.
 
     Parameters
     ----------
     query : str
         The SQL query.
+    use_sqlparse : bool
+        Whether to rely on `sqlparse` rather than the built-in lexer.
 
     Returns
     -------
@@ -59,7 +273,7 @@ def clean_query(query: str) -> str:
 
     Notes
     -----
-    1. `sqlparse` tries to set all supported SQL statements to uppercase.
+    1. Comments are stripped and SQL keywords set to lowercase (see `format_query()`).
     2. Further cleaning is done via the following regular expressions:
         * `"/\*.*\*/"` -> `""`: remove remaining multiline comments;
         * `"--.*"` -> `""`: remove remaining inline comments;
@@ -75,25 +289,154 @@ def clean_query(query: str) -> str:
         * `"[\s]+"` -> `" "`: replace multiple spaces by single spaces;
         * `";$"` -> `""`: remove final semicolumn (`;`).
 
+    These are not applied literally (see `_clean()`), as some backtrack terribly on
+    long lines: only their output is kept.
+
     """
     # good effort, but does not know some functions/keywords
-    q = sqlparse.format(query, keyword_case="lower", strip_comments=True)
-
-    # regular cleaning
-    q = re.sub(r"/\*.*\*/", "", q, flags=re.DOTALL)
-    q = re.sub("--.*", "", q)
-    q = re.sub("([(,)])", r" \1 ", q)
-    q = re.sub(r"([A-Za-z0-9_]+)\s*\.\s*([A-Za-z0-9_]+)", r"\1.\2", q)
-    q = re.sub(r"(.*)\s*[<=>]+\s*(.*)", r"\1 = \2", q)
-    q = re.sub(r"(.*)\s*\|\|\s*(.*)", r"\1 || \2", q)
-    q = re.sub(r"(.*)\s*::\s*(.*)", r"\1::\2", q)
-    q = re.sub(r"[\s]+", " ", q)
-    q = re.sub(";$", "", q)
-    q = q.strip()
+    q = format_query(query, use_sqlparse)
+
+    return _clean(q)
+
+
+def _clean(query: str) -> str:
+    r"""Regular cleaning of a SQL query, in linear time.
+
+    Parameters
+    ----------
+    query : str
+        The SQL query, formatted by `format_query()`.
+
+    Returns
+    -------
+    : str
+        Cleaned up query.
+
+    Notes
+    -----
+    Equivalent to the regular expressions listed in `clean_query()`, applied in order:
+
+    * multiline comments span from the first opening to the last closing tag (greedy
+      match), found via plain string searches;
+    * single spaces around function parameters via a translation table;
+    * the object descriptors only match from the start of a word (no backtracking from
+      within each word);
+    * the operators are handled line by line by `_surround()`;
+    * spaces are normalised by splitting/joining the query.
+
+    """
+    # remaining multiline comments
+    i, j = query.find("/*"), query.rfind("*/")
+    if -1 < i <= j - 2:
+        query = f"{query[:i]}{query[j + 2 :]}"
+
+    # remaining inline comments
+    query = _INLINE_COMMENT.sub("", query)
+
+    # single spaces around function parameters
+    query = query.translate(_PARAMETERS)
+
+    # no spaces around object descriptors
+    query = _DESCRIPTOR.sub(r"\1.\2", query)
+
+    # operators
+    query = _surround(query, "<=>", " = ", charset=True)
+    query = _surround(query, "||", " || ")
+    query = _surround(query, "::", "::")
+
+    # single spaces, and no final semicolumn
+    q = " ".join(query.split())
+    if query.endswith(";"):
+        q = q[:-1].rstrip()
 
     return q
 
 
+def _surround(
+    query: str, operator: str, replacement: str, charset: bool = False
+) -> str:
+    r"""Replace the last operator of each line, and the spaces following it.
+
+    Parameters
+    ----------
+    query : str
+        The SQL query.
+    operator : str
+        The operator, or the set of characters it is made of.
+    replacement : str
+        The operator replacement.
+    charset : bool
+        Whether the operator is any sequence of the characters provided.
+
+    Returns
+    -------
+    : str
+        The query, with the operators replaced.
+
+    Notes
+    -----
+    Linear-time equivalent of `re.sub(r"(.*)\s*<OPERATOR>\s*(.*)", "\1<REPLACEMENT>\2")`:
+    the greedy `(.*)` makes the last operator of each line the one replaced (or the one
+    starting the next line, spaces apart, if any); the `\s*` following it also swallows
+    line breaks, if any, and the `(.*)` the rest of the line it lands on.
+
+    """
+    s = []
+    n = len(query)
+    i = 0  # start of the line
+    m = None  # first non-space character following the end of the line
+
+    while i < n:
+        # end of the line
+        if (e := query.find("\n", i)) == -1:
+            e = n
+
+        # next line starts with the operator
+        if m is None or m < e:
+            m = _NONSPACE.search(query, e)
+            m = n if m is None else m.start()
+        if m < n and (
+            query[m] in operator if charset else query.startswith(operator, m)
+        ):
+            j = e
+            k = m
+
+        # last operator of the line
+        else:
+            if charset:
+                k = max(query.rfind(c, i, e) for c in operator)
+            else:
+                k = query.rfind(operator, i, e)
+
+            # nothing to do on this line
+            if k == -1:
+                s.append(query[i : e + 1])
+                i = e + 1
+                continue
+
+            j = k
+
+        # end of the operator, and following spaces
+        if charset:
+            while k < n and query[k] in operator:
+                k += 1
+        else:
+            k += len(operator)
+        if (f := _NONSPACE.search(query, k)) is None:
+            k = n
+        else:
+            k = f.start()
+
+        # rest of the line landed on
+        if (e := query.find("\n", k)) == -1:
+            e = n
+
+        s.append(f"{query[i:j]}{replacement}{query[k:e]}")
+        i = e
+
+    return "".join(s)
+
+
 def clean_functions(query: str) -> str:
     r"""Escape `FROM` operators in SQL functions.
 
@@ -120,23 +463,58 @@ def clean_functions(query: str) -> str:
     The `FROM` from the matched pattern will be replaced by `%FROM%` not to be matched
     by the follow up processing.
 
+    These are not applied literally (as many times as needed for the query to stop
+    changing), but the query is read word by word once: each `FROM` is checked against
+    the words surrounding it, which gives the same result as the regular expressions
+    applied to a fixed point.
+
     """
-    # clean up the query until its length does not change anymore
-    maxn = 1e99
-    while len(query) != maxn:
-        maxn = len(query)
-
-        # test for various cases; kind of expect a query that went through the
-        # clean_query() function first as it does not account for multiline text
-        for r in (
-            r"(\(\s+['\"].+?['\"]\s+)from(\s+\S+?\s+\))",
-            r"(\(\s+\S+?\s+)from(\s+\S+?\s+\))",
-            r"(\(\s+\S+?\s+)from(\s+\S+?\s+\()",  # reversed bracket
+    words = list(_WORD.finditer(query))
+    froms = []
+
+    # whether a quoted parameter was opened (on the same line) before each word
+    opened = [False] * len(words)
+    o = False
+    for i in range(1, len(words)):
+        if "\n" in query[words[i - 1].end() : words[i].start()]:
+            o = False
+        opened[i] = o
+        if query[words[i - 1].end() - 1] == "(" and query[words[i].start()] in "'\"":
+            o = True
+
+    # each FROM keyword preceded by a bracket and a single word (or quoted parameter),
+    # and followed by a single word and a bracket
+    for i in range(2, len(words) - 2):
+        if words[i].group() != "from":
+            continue
+
+        w1 = words[i - 1]
+        bracket = query[words[i - 2].end() - 1] == "("
+        closing = query[words[i + 2].start()]
+
+        if (bracket and closing in "()") or (
+            # quoted parameter opened by a previous word, or by the very same word
+            closing == ")"
+            and query[w1.end() - 1] in "'\""
+            and (
+                opened[i - 1]
+                or (
+                    bracket and query[w1.start()] in "'\"" and w1.end() - w1.start() > 2
+                )
+            )
         ):
-            for m in re.finditer(r, query):
-                query = query.replace(m.group(0), f"{m.group(1)}%FROM%{m.group(2)}")
+            froms.append(words[i])
+
+    # escape the keyword
+    s = []
+    i = 0
+    for w in froms:
+        s.append(query[i : w.start()])
+        s.append("%FROM%")
+        i = w.end()
+    s.append(query[i:])
 
-    return query
+    return "".join(s)
 
 
 def _split(
@@ -164,62 +542,113 @@ def _split(
     A subquery is identified as a CTE, _i.e._, `... as ( select ... )`. The following
     regular expression is used: `[^\s]+\s+AS\s+\(\s+SELECT`.
 
+    All CTEs (nested ones included) are located in a single pass over the query, each
+    opening bracket being paired with its closing counterpart via a stack; each CTE is
+    then stored with its nested CTEs replaced by a `%SUBQUERY:<name>%` placeholder,
+    innermost first. This keeps the processing linear in the length of the query,
+    regardless of the number of CTEs.
+
     """
     parts = {} if parts is None else parts
 
-    # regular expression to catch subquery
-    r = r"([^\s]+)(\s+as\s+)(\(\s+select)"
-
-    # extract subqueries until the length of the string does not change anymore
-    maxn = 1e99
-    while len(query) != maxn:
-        maxn = len(query)
-
-        # find a match
-        if (m := re.search(r, query)) is not None:
-            n = m.group(1)  # name of the subquery
-            a = m.group(2)  # ... as ...
-            i = m.end(2)  # start of the subquery
-            b = 0  # number of open/close brackets
-            s = ""  # stored characters
-
-            read = True  # store the characters until false
-            while read:
-                # fetch the next character
-                try:
-                    c = query[i]
-                except IndexError:
-                    c = None
-
-                # count opening/closing brackets
-                b += 1 if c == "(" else 0
-                b -= 1 if c == ")" else 0
+    # pair each opening bracket with the position following its closing counterpart
+    closing: dict[int, int] = {}
+    opened: list[int] = []
+    for m in re.finditer(r"[()]", query):
+        if m.group() == "(":
+            opened.append(m.start())
+        elif opened:
+            closing[opened.pop()] = m.end()
+
+    # end of the query, trailing spaces excluded
+    tail = len(query)
+    while tail and query[tail - 1].isspace():
+        tail -= 1
+
+    # locate all CTEs (nested ones included) as name, start, start of the subquery and
+    # end; the search for nested CTEs resumes from the start of the subquery, and an
+    # unbalanced subquery extends until the end of the (stripped if nested) query
+    spans: list[tuple[str, int, int, int]] = []
+    nested: list[list[int]] = [[]]  # nested CTEs of the query, then of each CTE
+    stored: list[int] = []  # CTEs in the order they are stored, innermost first
+    stack: list[int] = []
+    i = 0
+    while (m := _SUBQUERY.search(query, i)) is not None:
+        i = m.start(3)
+        j = closing.get(i, len(query))
+
+        n = m.group(1)
+        start = m.start()
+
+        # a CTE is complete as soon as another one starts after its end
+        while stack and spans[stack[-1]][3] <= start:
+            stored.append(stack.pop())
+
+        # a name overlapping the end of the previous CTE (invalid SQL, but it happens)
+        # refers to the placeholder of the latter
+        if stack and spans[stack[-1]][3] < m.end(3):
+            k = stack.pop()
+            stored.append(k)
+            nested[stack[-1] + 1 if stack else 0].pop()
+            n = f"%SUBQUERY:{spans[k][0]}%{query[spans[k][3] : m.end(1)]}"
+            start = spans[k][1]
+
+        if stack and j == len(query):
+            j = tail
+
+        nested[stack[-1] + 1 if stack else 0].append(len(spans))
+        nested.append([])
+        stack.append(len(spans))
+        spans.append((n, start, i, j))
+    stored.extend(reversed(stack))
+
+    # store each CTE with its nested CTEs replaced by placeholders
+    for k in stored:
+        n, _, i, j = spans[k]
+
+        # subqueries including subsubqueries are stripped, as historically done
+        if nested[k + 1]:
+            while query[j - 1].isspace():
+                j -= 1
+
+        # clean up further to make it readable
+        parts[n] = _COLUMNS.sub(
+            "select %COLUMNS% from",
+            _replace(query, i, j, [spans[c] for c in nested[k + 1]]),
+        )
 
-                # add the character to the stored string
-                s += c if c is not None else ""
+    return _replace(query, 0, len(query), [spans[c] for c in nested[0]]), parts
 
-                # iterate
-                i += 1
 
-                # stop reading when the counts reach 0
-                if not b or c is None:
-                    read = not read
+def _replace(query: str, i: int, j: int, spans: list[tuple[str, int, int, int]]) -> str:
+    r"""Replace CTEs by placeholders within a section of a query.
 
-            # remove the part(s) from the query and iterate
-            query = query.replace(f"{n}{a}{s}", f"%SUBQUERY:{n}%", 1)
+    Parameters
+    ----------
+    query : str
+        The DDL to parse.
+    i : int
+        Start of the section.
+    j : int
+        End of the section.
+    spans : list[tuple[str, int, int, int]]
+        Name, start, start of the subquery and end of each CTE to replace, in order.
 
-            # call itself over the subquery if it needs to be parsed further (subquery
-            # within subquery)
-            if re.search(r, s) is not None:
-                s, parts = _split(s.strip(), parts)
+    Returns
+    -------
+    : str
+        The section of the query, with each CTE replaced by `%SUBQUERY:<name>%`.
 
-            # clean up further to make it readable
-            s = re.sub(r"select\s+(.*?)\s+from", "select %COLUMNS% from", s)
+    """
+    s = []
 
-            # store the query and its parts
-            parts[n] = s
+    for n, start, _, end in spans:
+        s.append(query[i:start])
+        s.append(f"%SUBQUERY:{n}%")
+        i = end
+    s.append(query[i:j])
 
-    return query, parts
+    return "".join(s)
 
 
 def split_query(query: str) -> dict[str, str]:
@@ -242,13 +671,13 @@ def split_query(query: str) -> dict[str, str]:
 
     1. Search for `... as ( select ... )` CTE statement via the
        `[^\s]+\s+AS\s+\(\s+SELECT` regular expression.
-    2. Read each character from there, keeping count of opening/closing brackets; once
-       this number reaches zero (or we seeked to end of the query) we are done with the
-       subquery.
-    3. Store the subquery under the CTE name.
-    4. Recursively search for new CTE statements within the subquery, if any.
-    5. Move on to the next subquery.
-    6. Extract the main query, if any, using the following regular expressions (these
+    2. Pair each opening bracket with its closing counterpart; the subquery ends with
+       the bracket closing the one following the `AS` keyword (or at the end of the
+       query if unbalanced).
+    3. Store the subquery under the CTE name, starting with the innermost ones (CTEs
+       within CTEs), replaced in their parent by a `%SUBQUERY:<name>%` placeholder.
+    4. Move on to the next subquery.
+    5. Extract the main query, if any, using the following regular expressions (these
        could be factored a bit further but clarity prevails):
         * `CREATE\s+EXTERNAL\s+TABLE\s+([^\s]+)`
         * `CREATE\s+TABLE\s([^\s]+)`
@@ -272,16 +701,12 @@ def split_query(query: str) -> dict[str, str]:
         r"create\s+view\s+([^\s]+)",
     ):
         if (m := re.search(r, query, flags=re.IGNORECASE)) is not None:
-            parts[m.group(1)] = re.sub(
-                r"select\s+(.*?)\s+from", "select %COLUMNS% from", query
-            )
+            parts[m.group(1)] = _COLUMNS.sub("select %COLUMNS% from", query)
             break
 
     # if not object was found, we still want to analyze the last statement
     if len(parts) == maxn:
-        parts["SELECT"] = re.sub(
-            r"select\s+(.*?)\s+from", "select %COLUMNS% from", query
-        )
+        parts["SELECT"] = _COLUMNS.sub("select %COLUMNS% from", query)
 
     # clean out unwanted objects (containing our "%SUBQUERY:" keyword for instance,
     # product of using extra brackets and the imperfect regular expressions above)
@@ -318,45 +743,1450 @@ def fetch_dependencies(parts: dict[str, str]) -> dict[str, list[str]]:
 
     # iterate over each object -> associated subqueries
     for n, p in parts.items():
+        deps: set[str] = set()
         if any(f" {k} " in p.lower() for k in ("from", "join", "location")):
             for r in (
                 r"\s+from\s+([^\s(]+)",
                 r"\s+join\s+([^\s(]+)",
                 r"\s+location\s+'(s3://.+)'",
             ):
-                for m in re.finditer(r, p, flags=re.IGNORECASE):
-                    if n in tree:
-                        if m.group(1) not in tree[n]:
-                            tree[n].append(m.group(1))
-                    else:
-                        tree[n] = [m.group(1)]
-        else:
-            tree[n] = []
+                deps.update(m.group(1) for m in re.finditer(r, p, flags=re.IGNORECASE))
 
         # order the dependencies
-        tree[n].sort()
+        tree[n] = sorted(deps)
 
     return tree
 
 
-if __name__ == "__main__":
-    o: dict[str, list[str]] = {}
+class StatementError(ValueError):
+    r"""A statement exceeds the size or time allowed to process it."""
+
+
+@contextlib.contextmanager
+def time_limit(seconds: float | None) -> Iterator[None]:
+    r"""Interrupt the processing if it takes too long.
+
+    Parameters
+    ----------
+    seconds : float | None
+        Time allowed, unlimited if `None` (or `0`).
+
+    Raises
+    ------
+    StatementError
+        If the time allowed ran out.
+
+    Notes
+    -----
+    Relies on `SIGALRM`, hence unlimited on platforms without it (Windows) or outside
+    of the main thread.
+
+    """
+    if (
+        not seconds
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def alarm(signum: int, frame: object) -> None:
+        msg = f"Processing took longer than {seconds}s"
+        raise StatementError(msg)
+
+    previous = signal.signal(signal.SIGALRM, alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class Quarantine:
+    r"""Limits on the statements processed, and report of those exceeding them.
+
+    Parameters
+    ----------
+    timeout : float | None
+        Number of seconds allowed to process each statement, unlimited if `None`.
+    max_size : int | None
+        Number of characters allowed in each statement, unlimited if `None`.
+
+    Attributes
+    ----------
+    records : list[dict[str, str | int]]
+        File, size, reason and beginning of each statement set aside.
+
+    Notes
+    -----
+    Statements exceeding the limits are set aside (contributing no dependencies) rather
+    than stalling or failing the whole run; they are not cached, to be processed again
+    on the next run.
+
+    """
+
+    def __init__(
+        self, timeout: float | None = None, max_size: int | None = None
+    ) -> None:
+        r"""Set the limits.
+
+        Parameters
+        ----------
+        timeout : float | None
+            Number of seconds allowed to process each statement.
+        max_size : int | None
+            Number of characters allowed in each statement.
+
+        """
+        self.timeout = timeout
+        self.max_size = max_size
+        self.records: list[dict[str, str | int]] = []
+
+    def add(self, path: str, statement: str, error: StatementError) -> None:
+        r"""Set a statement aside.
+
+        Parameters
+        ----------
+        path : str
+            Path to the SQL script the statement comes from.
+        statement : str
+            The SQL statement.
+        error : StatementError
+            The limit exceeded.
+
+        """
+        self.records.append(
+            {
+                "file": path,
+                "size": len(statement),
+                "reason": str(error),
+                "statement": statement[:200],
+            }
+        )
+
+    @property
+    def stats(self) -> str:
+        r"""Summary of the statements set aside.
+
+        Returns
+        -------
+        : str
+            Number of statements and files.
+
+        """
+        files = len({r["file"] for r in self.records})
+        return f"quarantine: {len(self.records)} statements in {files} files"
+
+
+def extract_dependencies(
+    statement: str,
+    use_sqlparse: bool = False,
+    profiler: "Profiler | None" = None,
+    timeout: float | None = None,
+    max_size: int | None = None,
+) -> dict[str, list[str]]:
+    r"""Run a single statement through the whole parsing pipeline.
+
+    Parameters
+    ----------
+    statement : str
+        The SQL statement.
+    use_sqlparse : bool
+        Whether to rely on `sqlparse` rather than the built-in lexer.
+    profiler : Profiler | None
+        Records the time spent in each stage, if provided.
+    timeout : float | None
+        Number of seconds allowed to process the statement, unlimited if `None`.
+    max_size : int | None
+        Number of characters allowed in the statement, unlimited if `None`.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Dictionary of objects and associated list of upstream dependencies.
+
+    Raises
+    ------
+    StatementError
+        If the statement exceeds the size or time allowed.
+
+    Notes
+    -----
+    Module-level function (as opposed to a `lambda` or closure) to be picklable, hence
+    usable by worker processes.
+
+    """
+    stage = contextlib.nullcontext if profiler is None else profiler.stage
+
+    if max_size is not None and len(statement) > max_size:
+        msg = f"Statement longer than {max_size} characters"
+        raise StatementError(msg)
+
+    with time_limit(timeout):
+        # clean_query(), in two stages
+        with stage("format_query"):
+            q = format_query(statement, use_sqlparse)
+        with stage("clean_query"):
+            q = _clean(q)
+
+        with stage("clean_functions"):
+            q = clean_functions(q)
+        with stage("split_query"):
+            p = split_query(q)
+        with stage("fetch_dependencies"):
+            return fetch_dependencies(p)
+
+
+def merge_dependencies(
+    trees: Iterable[dict[str, list[str]]],
+    objects: dict[str, list[str]] | None = None,
+) -> dict[str, list[str]]:
+    r"""Merge the dependencies extracted from several statements.
+
+    Parameters
+    ----------
+    trees : Iterable[dict[str, list[str]]]
+        Dictionaries of objects and associated list of upstream dependencies, in the
+        order the statements were read.
+    objects : dict[str, list[str]]
+        Dictionary of objects already merged.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Updated dictionary of objects and upstream dependencies.
+
+    Notes
+    -----
+    Objects are kept in order of first appearance; objects defined more than once (the
+    final `SELECT` of several scripts for instance) see their dependencies combined and
+    sorted again, once all statements are merged.
+
+    """
+    objects = {} if objects is None else objects
+    combined: dict[str, set[str]] = {}
+
+    for t in trees:
+        for n, deps in t.items():
+            if n in combined:
+                combined[n].update(deps)
+            elif n in objects:
+                combined[n] = set(objects[n]).union(deps)
+            else:
+                objects[n] = deps
+
+    for n, deps in combined.items():
+        objects[n] = sorted(deps)
+
+    return objects
+
+
+def parser_version(use_sqlparse: bool = False) -> str:
+    r"""Identify the parsing logic, to invalidate results stored by another one.
+
+    Parameters
+    ----------
+    use_sqlparse : bool
+        Whether the statements are parsed via `sqlparse` rather than the built-in lexer.
+
+    Returns
+    -------
+    : str
+        Parser version, and backend.
+
+    """
+    if use_sqlparse:
+        import sqlparse  # only imported if requested, slow to load
+
+        return f"{PARSER_VERSION}:sqlparse-{sqlparse.__version__}"
+
+    return f"{PARSER_VERSION}:lexer"
+
+
+class DependencyCache:
+    r"""On-disk cache of the dependencies extracted from each statement.
+
+    Parameters
+    ----------
+    path : str | None
+        Directory to store the `SQLite` database into (created if needed); kept in
+        memory if `None`.
+    max_entries : int
+        Maximum number of statements to keep track of; the least recently used entries
+        are evicted first.
+
+    Attributes
+    ----------
+    hits : int
+        Number of statements found in the cache.
+    misses : int
+        Number of statements not found in the cache.
+
+    Notes
+    -----
+    Entries are keyed by the SHA-256 hash of the statement, salted with the parser
+    version (and backend) such that changes in the parsing logic do not serve stale
+    results.
+
+    """
+
+    def __init__(
+        self, path: str | None, max_entries: int = 100_000, use_sqlparse: bool = False
+    ) -> None:
+        r"""Open (or create) the cache.
+
+        Parameters
+        ----------
+        path : str | None
+            Directory to store the `SQLite` database into, in memory if `None`.
+        max_entries : int
+            Maximum number of statements to keep track of.
+        use_sqlparse : bool
+            Whether the statements are parsed via `sqlparse` rather than the built-in
+            lexer.
+
+        """
+        if path is not None:
+            pathlib.Path(path).mkdir(parents=True, exist_ok=True)
+
+        self._salt = parser_version(use_sqlparse)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(
+            ":memory:" if path is None else pathlib.Path(path) / "sql_to_json.sqlite"
+        )
+        self._db.execute(
+            "create table if not exists dependencies "
+            "(key text primary key, tree text not null, accessed real not null)"
+        )
+
+    def key(self, statement: str) -> str:
+        r"""Hash a statement.
+
+        Parameters
+        ----------
+        statement : str
+            The SQL statement.
+
+        Returns
+        -------
+        : str
+            Hexadecimal digest of the statement and parser version.
+
+        """
+        return hashlib.sha256(f"{self._salt}\0{statement}".encode()).hexdigest()
+
+    def get(self, statements: list[str]) -> list[dict[str, list[str]] | None]:
+        r"""Fetch the dependencies of the statements, if cached.
+
+        Parameters
+        ----------
+        statements : list[str]
+            The SQL statements.
+
+        Returns
+        -------
+        : list[dict[str, list[str]] | None]
+            Dictionary of objects and associated list of upstream dependencies for each
+            statement, `None` if not cached.
+
+        """
+        keys = [self.key(s) for s in statements]
+        found: dict[str, dict[str, list[str]]] = {}
+
+        # stay below the limit of host parameters of older SQLite versions
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            found.update(
+                (k, json.loads(t))
+                for k, t in self._db.execute(
+                    "select key, tree from dependencies "
+                    f"where key in ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+
+        # refresh the access time of the entries served
+        with self._db:
+            self._db.executemany(
+                "update dependencies set accessed = ? where key = ?",
+                ((time.time(), k) for k in found),
+            )
+
+        self.hits += sum(k in found for k in keys)
+        self.misses += sum(k not in found for k in keys)
+
+        return [found.get(k) for k in keys]
+
+    def put(self, trees: dict[str, dict[str, list[str]]]) -> None:
+        r"""Store the dependencies of the statements, and evict the oldest entries.
 
-    # command line argument
+        Parameters
+        ----------
+        trees : dict[str, dict[str, list[str]]]
+            Statements and associated dictionary of objects and upstream dependencies.
+
+        """
+        with self._db:
+            self._db.executemany(
+                "insert or replace into dependencies values (?, ?, ?)",
+                ((self.key(s), json.dumps(t), time.time()) for s, t in trees.items()),
+            )
+            self._db.execute(
+                "delete from dependencies where key in ("
+                "select key from dependencies order by accessed desc limit -1 offset ?"
+                ")",
+                (self.max_entries,),
+            )
+
+    def close(self) -> None:
+        r"""Close the underlying database."""
+        self._db.close()
+
+    @property
+    def stats(self) -> str:
+        r"""Summary of the cache usage.
+
+        Returns
+        -------
+        : str
+            Number of hits and misses.
+
+        """
+        return f"cache: {self.hits} hits, {self.misses} misses"
+
+
+class Profiler:
+    r"""Record the time spent (and memory allocated) in each stage of the pipeline.
+
+    Parameters
+    ----------
+    trace_memory : bool
+        Whether to trace the memory allocated in each stage too (slower).
+
+    Attributes
+    ----------
+    file : str
+        File the stages recorded belong to; set before processing each file.
+    records : list[tuple[str, str, float, float, int]]
+        File, stage, start (seconds since the profiler was created), duration (in
+        seconds) and peak memory allocated (in bytes, `0` if not traced) of each stage
+        run.
+
+    Notes
+    -----
+    Stages cannot be nested, the peak memory being reset at the start of each.
+
+    """
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        r"""Start recording.
+
+        Parameters
+        ----------
+        trace_memory : bool
+            Whether to trace the memory allocated in each stage too.
+
+        """
+        self.trace_memory = trace_memory
+        self.file = ""
+        self.records: list[tuple[str, str, float, float, int]] = []
+        self._t0 = time.perf_counter()
+
+        if trace_memory:
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        r"""Record a stage.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage.
+
+        """
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            m0 = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            t = time.perf_counter() - t0
+            m = tracemalloc.get_traced_memory()[1] - m0 if self.trace_memory else 0
+            self.records.append((self.file, name, t0 - self._t0, t, m))
+
+    def stop(self) -> None:
+        r"""Stop tracing the memory."""
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def slowest(self, n: int = 10) -> list[tuple[str, float, int]]:
+        r"""List the files the most time was spent on.
+
+        Parameters
+        ----------
+        n : int
+            Number of files to list.
+
+        Returns
+        -------
+        : list[tuple[str, float, int]]
+            File, time spent (in seconds) and largest peak memory of its stages (in
+            bytes), slowest first.
+
+        """
+        files: dict[str, list] = {}
+
+        for a, _, _, t, m in self.records:
+            f = files.setdefault(a, [0.0, 0])
+            f[0] += t
+            f[1] = max(f[1], m)
+
+        slowest = sorted(files.items(), key=lambda f: -f[1][0])
+
+        return [(a, t, m) for a, (t, m) in slowest[:n]]
+
+    def histogram(self) -> dict[str, list[int]]:
+        r"""Bucket the durations of the runs of each stage.
+
+        Returns
+        -------
+        : dict[str, list[int]]
+            Number of runs of each stage lasting less than 10us, 100us, 1ms, 10ms,
+            100ms, 1s, and longer.
+
+        """
+        stages: dict[str, list[int]] = {}
+
+        for _, name, _, t, _ in self.records:
+            h = stages.setdefault(name, [0] * len(HISTOGRAM_BUCKETS))
+            h[sum(t >= b for b in HISTOGRAM_BUCKETS[:-1])] += 1
+
+        return stages
+
+    def report(self, n: int = 10) -> str:
+        r"""Summarise the records.
+
+        Parameters
+        ----------
+        n : int
+            Number of slowest files to list.
+
+        Returns
+        -------
+        : str
+            Total time, peak memory and histogram of each stage, then the slowest files.
+
+        """
+        totals: dict[str, list] = {}
+        for _, name, _, t, m in self.records:
+            s = totals.setdefault(name, [0.0, 0])
+            s[0] += t
+            s[1] = max(s[1], m)
+
+        labels = ["<10us", "<100us", "<1ms", "<10ms", "<100ms", "<1s", ">=1s"]
+        lines = [
+            f"{'stage':<20} {'total':>10} {'peak mem':>10} "
+            + " ".join(f"{b:>7}" for b in labels)
+        ]
+        for name, h in self.histogram().items():
+            t, m = totals[name]
+            lines.append(
+                f"{name:<20} {t:>9.4f}s {m / 1024:>8.0f}kB "
+                + " ".join(f"{c:>7}" for c in h)
+            )
+
+        lines.append(f"{'file':<50} {'total':>10} {'peak mem':>10}")
+        for a, t, m in self.slowest(n):
+            lines.append(f"{a:<50} {t:>9.4f}s {m / 1024:>8.0f}kB")
+
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        r"""Export the records in the `Chrome` trace event format.
+
+        Returns
+        -------
+        : dict
+            Trace to load in `chrome://tracing` or [Perfetto](https://ui.perfetto.dev),
+            one complete event per stage run.
+
+        """
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": "sql_to_json",
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": t * 1e6,
+                    "pid": os.getpid(),
+                    "tid": 0,
+                    "args": {"file": a, "memory": m},
+                }
+                for a, name, start, t, m in self.records
+            ]
+        }
+
+
+def iter_dependencies(
+    paths: Iterable[str],
+    jobs: int = 1,
+    cache: DependencyCache | None = None,
+    use_sqlparse: bool = False,
+    profiler: Profiler | None = None,
+    quarantine: Quarantine | None = None,
+) -> Iterator[tuple[str, dict[str, list[str]]]]:
+    r"""Extract the dependencies of each statement of each file provided, lazily.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Path to the SQL script(s).
+    jobs : int
+        Number of worker processes; `1` processes everything in the current process,
+        `0` uses all available cores.
+    cache : DependencyCache | None
+        Cache of already processed statements, if any.
+    use_sqlparse : bool
+        Whether to rely on `sqlparse` rather than the built-in lexer.
+    profiler : Profiler | None
+        Records the time spent in each stage for each file, if provided; everything is
+        then processed in the current process.
+    quarantine : Quarantine | None
+        Limits on the statements, if any; those exceeding them are set aside.
+
+    Yields
+    ------
+    : str
+        Path to the SQL script the statement comes from.
+    : dict[str, list[str]]
+        Dictionary of objects and associated list of upstream dependencies.
+
+    Notes
+    -----
+    Statements (rather than files) are distributed to the workers, such that a handful
+    of large scripts still keep all workers busy; a few statements per worker are kept
+    in flight, and results are yielded in submission order as soon as available. The
+    output is hence identical to a serial run. Only the statements not found in the
+    cache are processed.
+
+    """
+    func = functools.partial(
+        extract_dependencies,
+        use_sqlparse=use_sqlparse,
+        profiler=profiler,
+        timeout=None if quarantine is None else quarantine.timeout,
+        max_size=None if quarantine is None else quarantine.max_size,
+    )
+    jobs = 1 if profiler is not None else jobs or os.cpu_count() or 1
+    stage = contextlib.nullcontext if profiler is None else profiler.stage
+
+    # statements not processed yet, and processed ones not cached yet
+    pending: collections.deque = collections.deque()
+    fresh: dict[str, dict[str, list[str]]] = {}
+
+    with contextlib.ExitStack() as stack:
+        if jobs > 1:
+            executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(jobs))
+
+        for a in paths:
+            if profiler is not None:
+                profiler.file = a
+            with pathlib.Path(a).open() as f, stage("split_statements"):
+                statements = split_statements(f.read(), use_sqlparse)
+
+            # fetch what can be, process the rest (later if not in parallel)
+            trees = [None] * len(statements) if cache is None else cache.get(statements)
+            for s, t in zip(statements, trees):
+                if t is None and jobs > 1:
+                    t = executor.submit(func, s)
+                pending.append((a, s, t))
+
+            # yield whatever is ready, do not hold too much work in flight
+            while pending and (
+                len(pending) > jobs * 4
+                or not isinstance(pending[0][2], concurrent.futures.Future)
+                or pending[0][2].done()
+            ):
+                yield _resolve(func, pending.popleft(), fresh, quarantine)
+
+        while pending:
+            yield _resolve(func, pending.popleft(), fresh, quarantine)
+
+    if cache is not None:
+        cache.put(fresh)
+
+
+def _resolve(
+    func: Callable,
+    item: tuple[str, str, concurrent.futures.Future | dict[str, list[str]] | None],
+    fresh: dict[str, dict[str, list[str]]],
+    quarantine: Quarantine | None = None,
+) -> tuple[str, dict[str, list[str]]]:
+    r"""Fetch the dependencies of a statement, processing it if not done yet.
+
+    Parameters
+    ----------
+    func : Callable
+        Function extracting the dependencies of a statement.
+    item : tuple[str, str, concurrent.futures.Future | dict[str, list[str]] | None]
+        Path to the SQL script, statement and its dependencies (if cached), the future
+        thereof (if submitted to a worker), or `None` (if not processed yet).
+    fresh : dict[str, dict[str, list[str]]]
+        Statements and associated dependencies processed so far, updated in place.
+    quarantine : Quarantine | None
+        Report of the statements set aside, updated in place; errors are raised if
+        `None`.
+
+    Returns
+    -------
+    : str
+        Path to the SQL script the statement comes from.
+    : dict[str, list[str]]
+        Dictionary of objects and associated list of upstream dependencies.
+
+    """
+    a, s, t = item
+
+    try:
+        if isinstance(t, concurrent.futures.Future):
+            t = fresh[s] = t.result()
+        elif t is None:
+            t = fresh[s] = func(s)
+    except StatementError as e:
+        if quarantine is None:
+            raise
+        quarantine.add(a, s, e)
+        t = {}
+
+    return a, t
+
+
+def extract_files(
+    paths: Iterable[str],
+    jobs: int = 1,
+    cache: DependencyCache | None = None,
+    use_sqlparse: bool = False,
+    profiler: Profiler | None = None,
+    quarantine: Quarantine | None = None,
+) -> dict[str, list[str]]:
+    r"""Extract and merge the dependencies of all statements of all files provided.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Path to the SQL script(s).
+    jobs : int
+        Number of worker processes; `1` processes everything in the current process,
+        `0` uses all available cores.
+    cache : DependencyCache | None
+        Cache of already processed statements, if any.
+    use_sqlparse : bool
+        Whether to rely on `sqlparse` rather than the built-in lexer.
+    profiler : Profiler | None
+        Records the time spent in each stage for each file, if provided.
+    quarantine : Quarantine | None
+        Limits on the statements, if any; those exceeding them are set aside.
+
+    Returns
+    -------
+    : dict[str, list[str]]
+        Dictionary of objects and associated list of upstream dependencies.
+
+    Notes
+    -----
+    See `iter_dependencies()`.
+
+    """
+    return merge_dependencies(
+        t
+        for _, t in iter_dependencies(
+            paths, jobs, cache, use_sqlparse, profiler, quarantine
+        )
+    )
+
+
+def affected_objects(
+    before: dict[str, list[str]], after: dict[str, list[str]]
+) -> list[str]:
+    r"""List the objects affected by the changes between two versions of the objects.
+
+    Parameters
+    ----------
+    before : dict[str, list[str]]
+        Previous dictionary of objects and upstream dependencies.
+    after : dict[str, list[str]]
+        Current dictionary of objects and upstream dependencies.
+
+    Returns
+    -------
+    : list[str]
+        Objects added, removed or whose dependencies changed, followed by all objects
+        downstream of them (objects depending on them, regardless of the depth).
+
+    """
+    changed = [n for n, deps in after.items() if before.get(n) != deps]
+    changed += [n for n in before if n not in after]
+
+    g = Graph.from_json(after)
+
+    def children(n: str) -> list[str]:
+        i = g.id(n)
+        return [] if i is None else [g.name(c) for c in g.children(i)]
+
+    return list(traverse(changed, children))
+
+
+class DependencyState:
+    r"""Dependencies extracted from each file on a previous run, to only process changes.
+
+    Parameters
+    ----------
+    path : str | None
+        JSON file to store the state into (loaded if it exists); kept in memory if
+        `None`.
+    use_sqlparse : bool
+        Whether the statements are parsed via `sqlparse` rather than the built-in lexer.
+
+    Attributes
+    ----------
+    files : dict[str, dict]
+        Modification time, size, SHA-256 hash and dependencies of each statement, for
+        each file.
+    objects : dict[str, list[str]]
+        Dictionary of objects and upstream dependencies of the previous run.
+    parsed : int
+        Number of files (re)processed.
+    unchanged : int
+        Number of files served from the state.
+
+    Notes
+    -----
+    Files whose modification time and size did not change are not read again; the
+    others are hashed, and processed again only if their content changed. The whole
+    state is discarded if produced by another parser version (or backend).
+
+    """
+
+    def __init__(self, path: str | None, use_sqlparse: bool = False) -> None:
+        r"""Load the state, if any.
+
+        Parameters
+        ----------
+        path : str | None
+            JSON file to store the state into, in memory if `None`.
+        use_sqlparse : bool
+            Whether the statements are parsed via `sqlparse` rather than the built-in
+            lexer.
+
+        """
+        self.path = None if path is None else pathlib.Path(path)
+        self.use_sqlparse = use_sqlparse
+        self.parsed = 0
+        self.unchanged = 0
+
+        state = {}
+        if self.path is not None and self.path.exists():
+            state = json.loads(self.path.read_text())
+        if state.get("parser") != parser_version(use_sqlparse):
+            state = {}
+
+        self.files: dict[str, dict] = state.get("files", {})
+        self.objects: dict[str, list[str]] = state.get("objects", {})
+
+    def changed(self, paths: Iterable[str]) -> list[str]:
+        r"""List the files changed since the previous run.
+
+        Parameters
+        ----------
+        paths : Iterable[str]
+            Path to the SQL script(s).
+
+        Returns
+        -------
+        : list[str]
+            Files not processed yet, or whose content changed.
+
+        """
+        changed = []
+
+        for a in dict.fromkeys(paths):
+            st = os.stat(a)
+            f = self.files.get(a)
+
+            if f is not None and (f["mtime"], f["size"]) == (
+                st.st_mtime_ns,
+                st.st_size,
+            ):
+                continue
+
+            h = hashlib.sha256(pathlib.Path(a).read_bytes()).hexdigest()
+            if f is not None and f["sha256"] == h:
+                f["mtime"], f["size"] = st.st_mtime_ns, st.st_size
+                continue
+
+            self.files[a] = {
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "sha256": h,
+                "trees": None,
+            }
+            changed.append(a)
+
+        return changed
+
+    def update(
+        self,
+        paths: Iterable[str],
+        jobs: int = 1,
+        cache: DependencyCache | None = None,
+        profiler: Profiler | None = None,
+        quarantine: Quarantine | None = None,
+    ) -> tuple[dict[str, list[str]], list[str]]:
+        r"""Process the changed files, and merge the dependencies of all files provided.
+
+        Parameters
+        ----------
+        paths : Iterable[str]
+            Path to the SQL script(s).
+        jobs : int
+            Number of worker processes; `1` processes everything in the current process,
+            `0` uses all available cores.
+        cache : DependencyCache | None
+            Cache of already processed statements, if any.
+        profiler : Profiler | None
+            Records the time spent in each stage for each file, if provided.
+        quarantine : Quarantine | None
+            Limits on the statements, if any; those exceeding them are set aside, and
+            their files processed again on the next run.
+
+        Returns
+        -------
+        : dict[str, list[str]]
+            Dictionary of objects and associated list of upstream dependencies.
+        : list[str]
+            Objects affected by the changes since the previous run (see
+            `affected_objects()`).
+
+        Notes
+        -----
+        The dependencies of the unchanged files are merged back in the order the files
+        are provided: the output is identical to a full run.
+
+        """
+        paths = list(paths)
+        changed = self.changed(paths)
+
+        for a in changed:
+            self.files[a]["trees"] = []
+        n = 0 if quarantine is None else len(quarantine.records)
+        for a, t in iter_dependencies(
+            changed, jobs, cache, self.use_sqlparse, profiler, quarantine
+        ):
+            self.files[a]["trees"].append(t)
+
+        # files with statements set aside are not considered processed
+        for r in [] if quarantine is None else quarantine.records[n:]:
+            self.files[r["file"]].update(mtime=None, sha256=None)
+
+        # forget the files not provided anymore
+        self.files = {a: self.files[a] for a in dict.fromkeys(paths)}
+        self.parsed += len(changed)
+        self.unchanged += len(self.files) - len(changed)
+
+        objects = merge_dependencies(t for a in paths for t in self.files[a]["trees"])
+        affected = affected_objects(self.objects, objects)
+        self.objects = objects
+
+        return objects, affected
+
+    def save(self) -> None:
+        r"""Store the state (if not kept in memory), replacing the previous one at once."""
+        if self.path is not None:
+            write_atomic(
+                self.path,
+                json.dumps(
+                    {
+                        "parser": parser_version(self.use_sqlparse),
+                        "files": self.files,
+                        "objects": self.objects,
+                    }
+                ),
+            )
+
+    @property
+    def stats(self) -> str:
+        r"""Summary of the state usage.
+
+        Returns
+        -------
+        : str
+            Number of files processed and served from the state.
+
+        """
+        return f"state: {self.parsed} files parsed, {self.unchanged} unchanged"
+
+
+def write_atomic(path: str | pathlib.Path, content: str | bytes) -> None:
+    r"""Write a file at once, readers never seeing it partially written.
+
+    Parameters
+    ----------
+    path : str | pathlib.Path
+        File to (over)write.
+    content : str | bytes
+        Content of the file.
+
+    Notes
+    -----
+    The content is written to a temporary file next to it first, then renamed.
+
+    """
+    path = pathlib.Path(path)
+    tmp = path.with_name(f"{path.name}.tmp")
+    if isinstance(content, bytes):
+        tmp.write_bytes(content)
+    else:
+        tmp.write_text(content)
+    os.replace(tmp, path)
+
+
+def _inotify(paths: list[str]) -> Iterator[None] | None:
+    r"""Wait for the files to change via `inotify`, if available (Linux only).
+
+    Parameters
+    ----------
+    paths : list[str]
+        Path to the files to watch.
+
+    Returns
+    -------
+    : Iterator[None] | None
+        Yields each time (a burst of) events concern the files, forever; `None` if
+        `inotify` is not available.
+
+    Notes
+    -----
+    The parent directories are watched rather than the files themselves, as most
+    editors save files by replacing them.
+
+    """
+    import ctypes  # only imported if requested, not needed otherwise
+    import ctypes.util
+    import select
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+    except (AttributeError, OSError):
+        return None
+    if fd < 0:
+        return None
+
+    # IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE
+    mask = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+    files = {os.path.abspath(a) for a in paths}
+    watches = {}
+    for d in {os.path.dirname(a) for a in files}:
+        wd = libc.inotify_add_watch(fd, os.fsencode(d), mask)
+        if wd < 0:
+            os.close(fd)
+            return None
+        watches[wd] = d
+
+    def events() -> Iterator[None]:
+        try:
+            while True:
+                buffer = os.read(fd, 1 << 16)
+
+                # drain the burst of events (an editor saving a file)
+                while select.select([fd], [], [], 0.005)[0]:
+                    buffer += os.read(fd, 1 << 16)
+
+                # struct inotify_event: wd, mask, cookie, len, name; events lost if
+                # the queue overflowed (wd -1), any file might have changed then
+                i, changed = 0, False
+                while i < len(buffer):
+                    wd, _, _, n = struct.unpack_from("iIII", buffer, i)
+                    name = buffer[i + 16 : i + 16 + n].rstrip(b"\0")
+                    if wd not in watches:
+                        changed = True
+                    else:
+                        changed |= os.path.join(watches[wd], os.fsdecode(name)) in files
+                    i += 16 + n
+
+                if changed:
+                    yield
+        finally:
+            os.close(fd)
+
+    return events()
+
+
+def _poll(paths: list[str], interval: float) -> Iterator[None]:
+    r"""Wait for the files to change by polling their modification time and size.
+
+    Parameters
+    ----------
+    paths : list[str]
+        Path to the files to watch.
+    interval : float
+        Number of seconds between two checks.
+
+    Yields
+    ------
+    : None
+        Each time any of the files changed, forever.
+
+    """
+
+    def signature() -> list[tuple[int, int] | None]:
+        s = []
+        for a in paths:
+            try:
+                st = os.stat(a)
+                s.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                s.append(None)
+        return s
+
+    previous = signature()
+
+    while True:
+        time.sleep(interval)
+        if (current := signature()) != previous:
+            previous = current
+            yield
+
+
+def watch_files(
+    paths: Iterable[str], interval: float = 0.5, poll: bool = False
+) -> Iterator[None]:
+    r"""Wait for the files to change.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Path to the files to watch.
+    interval : float
+        Number of seconds between two checks, if polling.
+    poll : bool
+        Whether to poll even if `inotify` is available.
+
+    Returns
+    -------
+    : Iterator[None]
+        Yields each time any of the files changed, forever.
+
+    Notes
+    -----
+    Relies on `inotify` if available, falls back on polling otherwise.
+
+    """
+    paths = list(paths)
+    events = None if poll else _inotify(paths)
+
+    return _poll(paths, interval) if events is None else events
+
+
+def watch_dependencies(
+    paths: Iterable[str],
+    output: str,
+    jobs: int = 1,
+    cache: DependencyCache | None = None,
+    state: DependencyState | None = None,
+    indent: int | None = None,
+    interval: float = 0.5,
+    quarantine: Quarantine | None = None,
+    fmt: str = "json",
+    compress: bool = False,
+    use_sqlparse: bool = False,
+    profiler: Profiler | None = None,
+    events: Iterable[None] | None = None,
+) -> None:
+    r"""Keep the dependencies of the files up to date, until interrupted.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Path to the SQL script(s).
+    output : str
+        File to (over)write each time the dependencies change.
+    jobs : int
+        Number of worker processes for the first run; `0` uses all available cores.
+    cache : DependencyCache | None
+        Cache of already processed statements, in memory if `None`.
+    state : DependencyState | None
+        Dependencies extracted on a previous run, in memory if `None`.
+    indent : int | None
+        Indentation of the JSON output.
+    interval : float
+        Number of seconds between two checks, if polling.
+    quarantine : Quarantine | None
+        Limits on the statements, if any; those exceeding them are set aside.
+    fmt : str
+        Format of the output, `json` or `bin`.
+    compress : bool
+        Whether to compress the binary output.
+    use_sqlparse : bool
+        Whether to parse the statements via `sqlparse` rather than the built-in lexer,
+        if no `cache` or `state` is provided (they carry their own setting otherwise).
+    profiler : Profiler | None
+        Profiler recording the stages of each file processed, if any.
+    events : Iterable[None] | None
+        Changes to wait for (one item per change), `watch_files()` if `None`.
+
+    Notes
+    -----
+    Only the files changed, and in them only the statements changed, are processed
+    again; changes are processed in the current process (starting workers would take
+    longer than parsing a handful of statements). A line is reported on `stderr` after
+    each update.
+
+    """
+    paths = list(paths)
+    cache = DependencyCache(None, use_sqlparse=use_sqlparse) if cache is None else cache
+    state = DependencyState(None, use_sqlparse) if state is None else state
+    first = True
+
+    events = watch_files(paths, interval) if events is None else events
+
+    for _ in itertools.chain([None], events):
+        t0 = time.perf_counter()
+
+        # files might be missing for a short while, replaced by an editor
+        found = [a for a in paths if os.path.exists(a)]
+        o, affected = state.update(
+            found, jobs if first else 1, cache, profiler, quarantine
+        )
+
+        if affected or first:
+            write_atomic(output, dump_graph(o, fmt, compress, indent))
+            state.save()
+            sys.stderr.write(
+                f"{len(affected)} objects affected, "
+                f"{(time.perf_counter() - t0) * 1000:.0f}ms\n"
+            )
+
+        first = False
+
+
+if __name__ == "__main__":
+    # command line arguments
     if "--pretty" in sys.argv:
         sys.argv.remove("--pretty")
         indent = 4
     else:
         indent = 0
 
+    if "--format" in sys.argv:
+        i = sys.argv.index("--format")
+        fmt = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        fmt = "json"
+
+    if "--compress" in sys.argv:
+        sys.argv.remove("--compress")
+        compress = True
+    else:
+        compress = False
+
+    if "--jobs" in sys.argv:
+        i = sys.argv.index("--jobs")
+        jobs = int(sys.argv[i + 1])
+        del sys.argv[i : i + 2]
+    else:
+        jobs = 1
+
+    if "--cache-size" in sys.argv:
+        i = sys.argv.index("--cache-size")
+        size = int(sys.argv[i + 1])
+        del sys.argv[i : i + 2]
+    else:
+        size = 100_000
+
+    if "--ndjson" in sys.argv:
+        sys.argv.remove("--ndjson")
+        ndjson = True
+    else:
+        ndjson = False
+
+    if "--sqlparse" in sys.argv:
+        sys.argv.remove("--sqlparse")
+        use_sqlparse = True
+    else:
+        use_sqlparse = False
+
+    if "--cache-dir" in sys.argv:
+        i = sys.argv.index("--cache-dir")
+        cache = DependencyCache(sys.argv[i + 1], size, use_sqlparse)
+        del sys.argv[i : i + 2]
+    else:
+        cache = None
+
+    if "--state" in sys.argv:
+        i = sys.argv.index("--state")
+        state = DependencyState(sys.argv[i + 1], use_sqlparse)
+        del sys.argv[i : i + 2]
+    else:
+        state = None
+
+    if "--watch" in sys.argv:
+        sys.argv.remove("--watch")
+        watch = True
+    else:
+        watch = False
+
+    if "--output" in sys.argv:
+        i = sys.argv.index("--output")
+        output = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        output = None
+
+    if "--affected" in sys.argv:
+        i = sys.argv.index("--affected")
+        affected_path = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        affected_path = None
+
+    if "--timeout" in sys.argv:
+        i = sys.argv.index("--timeout")
+        timeout = float(sys.argv[i + 1])
+        del sys.argv[i : i + 2]
+    else:
+        timeout = None
+
+    if "--max-size" in sys.argv:
+        i = sys.argv.index("--max-size")
+        max_size = int(sys.argv[i + 1])
+        del sys.argv[i : i + 2]
+    else:
+        max_size = None
+
+    if "--quarantine" in sys.argv:
+        i = sys.argv.index("--quarantine")
+        quarantine_path = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        quarantine_path = None
+
+    if timeout is not None or max_size is not None or quarantine_path is not None:
+        quarantine = Quarantine(timeout, max_size)
+    else:
+        quarantine = None
+
+    if "--profile-top" in sys.argv:
+        i = sys.argv.index("--profile-top")
+        top = int(sys.argv[i + 1])
+        del sys.argv[i : i + 2]
+    else:
+        top = 10
+
+    if "--pstats" in sys.argv:
+        i = sys.argv.index("--pstats")
+        pstats_path = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+
+        import cProfile  # only imported if requested, not needed otherwise
+
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+    else:
+        pstats_path = None
+
+    if "--trace" in sys.argv:
+        i = sys.argv.index("--trace")
+        trace_path = sys.argv[i + 1]
+        del sys.argv[i : i + 2]
+    else:
+        trace_path = None
+
+    if "--profile" in sys.argv:
+        sys.argv.remove("--profile")
+        profiler = Profiler()
+    elif os.environ.get("SQL_TO_JSON_PROFILE") or trace_path is not None:
+        profiler = Profiler()
+    else:
+        profiler = None
+
+    # keep the output up to date
+    if watch:
+        if output is None:
+            msg = "--watch requires --output"
+            raise ValueError(msg)
+        with contextlib.suppress(KeyboardInterrupt):
+            watch_dependencies(
+                sys.argv[1:],
+                output,
+                jobs,
+                cache,
+                state,
+                indent if indent else None,
+                quarantine=quarantine,
+                fmt=fmt,
+                compress=compress,
+                use_sqlparse=use_sqlparse,
+                profiler=profiler,
+            )
+
+    # stream one record per object, statement after statement
+    elif ndjson:
+        for a, t in iter_dependencies(
+            sys.argv[1:], jobs, cache, use_sqlparse, profiler, quarantine
+        ):
+            for n, deps in t.items():
+                sys.stdout.write(
+                    f"{json.dumps({'object': n, 'parents': deps, 'source': a})}\n"
+                )
+            sys.stdout.flush()
+
+    # parse each statement of each changed script provided
+    elif state is not None:
+        o, affected = state.update(sys.argv[1:], jobs, cache, profiler, quarantine)
+        state.save()
+        sys.stderr.write(f"{state.stats}, {len(affected)} objects affected\n")
+        if affected_path is not None:
+            pathlib.Path(affected_path).write_text("".join(f"{n}\n" for n in affected))
+
+        # output
+        sys.stdout.buffer.write(dump_graph(o, fmt, compress, indent or None))
+
     # parse each statement in each script provided
-    for a in sys.argv[1:]:
-        with pathlib.Path(a).open() as f:
-            for rq in sqlparse.split(f.read()):
-                q = clean_query(rq)
-                q = clean_functions(q)
-                p = split_query(q)
-                t = fetch_dependencies(p)
-
-            # output
-            sys.stdout.write(json.dumps(t, indent=indent if indent else None))
+    else:
+        o = extract_files(sys.argv[1:], jobs, cache, use_sqlparse, profiler, quarantine)
+
+        # output
+        sys.stdout.buffer.write(dump_graph(o, fmt, compress, indent or None))
+
+    if cache is not None:
+        cache.close()
+        sys.stderr.write(f"{cache.stats}\n")
+
+    # statements set aside
+    if quarantine is not None:
+        sys.stderr.write(f"{quarantine.stats}\n")
+        if quarantine_path is not None:
+            pathlib.Path(quarantine_path).write_text(
+                json.dumps(quarantine.records, indent=4)
+            )
+
+    # profiling reports
+    if profiler is not None:
+        profiler.stop()
+        sys.stderr.write(f"{profiler.report(top)}\n")
+        if trace_path is not None:
+            pathlib.Path(trace_path).write_text(json.dumps(profiler.chrome_trace()))
+
+    if pstats_path is not None:
+        cprofile.disable()
+        cprofile.dump_stats(pstats_path)
@@ -0,0 +1,70 @@
+"""Some test regarding the coarsening of graphs."""
+
+import pytest
+
+from coarsen_json import (
+    by_component,
+    by_scc,
+    by_schema,
+    coarsen_json,
+    collapse,
+    transitive_reduction,
+)
+
+# s1.a -> s2.b -> s2.c, s1.a -> s2.c, s1.a -> s1.x -> s3.d -> s1.a, s4.e -> s4.f
+OBJECTS = {
+    "s1.a": ["s2.b", "s2.c", "s1.x"],
+    "s2.b": ["s2.c"],
+    "s1.x": ["s3.d"],
+    "s3.d": ["s1.a"],
+    "s4.e": ["s4.f"],
+}
+
+
+def test_groupings() -> None:
+    """Test objects are grouped by schema, component and strongly connected component."""
+    assert set(by_schema(OBJECTS).values()) == {"s1", "s2", "s3", "s4"}
+    assert set(by_component(OBJECTS).values()) == {"s1.a +4", "s4.e +1"}
+    assert by_scc(OBJECTS) == {
+        "s1.a": "s1.a +2",
+        "s2.b": "s2.b",
+        "s2.c": "s2.c",
+        "s1.x": "s1.a +2",
+        "s3.d": "s1.a +2",
+        "s4.e": "s4.e",
+        "s4.f": "s4.f",
+    }
+
+
+def test_collapse() -> None:
+    """Test dependencies within groups are dropped, the others listed once."""
+    assert collapse(OBJECTS, by_schema(OBJECTS)) == {
+        "s1": ["s2", "s3"],
+        "s2": [],
+        "s3": ["s1"],
+        "s4": [],
+    }
+
+
+def test_transitive_reduction() -> None:
+    """Test dependencies implied by others are dropped, cycles refused."""
+    assert coarsen_json(OBJECTS, "scc", reduce=True) == {
+        "s1.a +2": ["s2.b"],
+        "s2.b": ["s2.c"],
+        "s4.e": ["s4.f"],
+    }
+
+    with pytest.raises(ValueError):
+        transitive_reduction(OBJECTS)
+
+
+def test_deep_lineage() -> None:
+    """Test long chains do not hit the recursion limit."""
+    objects = {f"t{i}": [f"t{i + 1}"] for i in range(10000)}
+    objects["t10000"] = ["t0"]
+
+    assert len(set(by_scc(objects).values())) == 1
+    assert transitive_reduction({**objects, "t10000": []}) == {
+        **objects,
+        "t10000": [],
+    }
@@ -0,0 +1,68 @@
+"""Some test regarding the conversion of CSV content."""
+
+import pathlib
+
+import pytest
+
+from csv_to_json import (
+    read_edges,
+    shard_files,
+    sharded_json,
+    stream_json,
+    to_json,
+)
+
+
+def test_read_edges() -> None:
+    """Test quoted names, header and empty rows are handled."""
+    rows = ["child,parent\n", 'a,"b,1"\n', "\n", '"c ""x""",b\r\n', " , \n"]
+
+    assert list(read_edges(rows, header=True)) == [
+        ("a", "b,1"),
+        ('c "x"', "b"),
+        (" ", " "),
+    ]
+
+    with pytest.raises(ValueError):
+        list(read_edges(["a,b,c\n"]))
+
+
+def test_stream_json() -> None:
+    """Test the streamed conversion matches the original one, deduplicated."""
+    content = "a,b\nc,b\na,b\nd,e\n"
+
+    o = stream_json(content.splitlines(keepends=True))
+    assert o == {"b": {"a": None, "c": None}, "e": {"d": None}}
+
+    # across files
+    o = stream_json(["a,e\n", "d,e\n"], o)
+    assert {k: list(v) for k, v in o.items()} == {"b": ["a", "c"], "e": ["d", "a"]}
+
+    assert {k: list(dict.fromkeys(v)) for k, v in to_json(content, {}).items()} == {
+        k: list(v) for k, v in stream_json(content.splitlines()).items()
+    }
+
+
+def test_sharded_json(tmp_path: pathlib.Path) -> None:
+    """Test files are split in whole rows, and their shards merged as a serial run."""
+    (tmp_path / "1.csv").write_text("child,parent\na,b\nc,b\n\na,d\n")
+    (tmp_path / "2.csv").write_text("child,parent\nc,d\na,b\ne,b")
+    paths = [tmp_path / "1.csv", tmp_path / "2.csv"]
+
+    shards = shard_files(paths, 8)
+    assert shards == [
+        (str(paths[0]), 0, 13),
+        (str(paths[0]), 13, 21),
+        (str(paths[0]), 21, 26),
+        (str(paths[1]), 0, 13),
+        (str(paths[1]), 13, 21),
+        (str(paths[1]), 21, 24),
+    ]
+
+    o: dict[str, dict[str, None]] = {}
+    for p in paths:
+        with p.open(newline="") as f:
+            o = stream_json(f, o, header=True)
+
+    for jobs in (1, 2):
+        assert list(sharded_json(paths, jobs, header=True).items()) == list(o.items())
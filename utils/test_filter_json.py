@@ -0,0 +1,189 @@
+"""Some test regarding the filtering of lineages."""
+
+import collections
+import json
+import pathlib
+import subprocess
+import sys
+from collections.abc import Hashable
+
+import pytest
+
+from filter_json import (
+    GraphIndex,
+    build_index,
+    closure,
+    filter_batch,
+    filter_index,
+    filter_index_batch,
+    filter_json,
+    index_json,
+    is_index,
+    read_input,
+    traverse,
+)
+from graph import dump_graph
+
+# view3 -> view2 -> view1 -> table1, view2 -> table2, view4 -> view1
+OBJECTS = {
+    "view1": ["table1"],
+    "view2": ["view1", "table2"],
+    "view3": ["view2"],
+    "view4": ["view1"],
+}
+
+
+def test_index_json() -> None:
+    """Test objects are indexed in both directions, dependencies deduplicated."""
+    forward, reverse = index_json({**OBJECTS, "view4": ["view1", "view1"]})
+
+    assert forward["view4"] == ["view1"]
+    assert reverse == {
+        "table1": ["view1"],
+        "view1": ["view2", "view4"],
+        "table2": ["view2"],
+        "view2": ["view3"],
+    }
+
+
+def test_traverse() -> None:
+    """Test each node is reached once, at its shortest distance, cycles included."""
+    graph = {1: [2, 3], 2: [3, 4], 3: [1], 4: []}
+
+    assert traverse([1], graph.__getitem__) == {1: 0, 2: 1, 3: 1, 4: 2}
+    assert traverse([1], graph.__getitem__, max_depth=1) == {1: 0, 2: 1, 3: 1}
+    assert traverse([1], graph.__getitem__, max_depth=0) == {1: 0}
+
+
+def test_closure() -> None:
+    """Test closures already computed are merged rather than walked again."""
+    graph = {1: [2], 2: [3], 3: [1, 4], 4: []}
+    memo = {}
+
+    assert closure(2, graph.__getitem__, memo) == {2: None, 3: None, 1: None, 4: None}
+    assert closure(4, graph.__getitem__, memo) == {4: None}
+
+    # poison the memo to make sure it is used
+    memo[4] = {4: None, 5: None}
+    assert set(closure(3, graph.__getitem__, memo)) == {1, 2, 3, 4, 5}
+
+    # a deep subgraph shared through nodes not started from is walked for each
+    graph = {"a": [0], "b": [0], **{i: [i + 1] for i in range(100)}, 100: []}
+    expanded = collections.Counter()
+
+    def neighbours(n: Hashable) -> list[Hashable]:
+        expanded[n] += 1
+        return graph[n]
+
+    memo = {}
+    assert list(closure("a", neighbours, memo)) == ["a", *range(101)]
+    assert list(closure("b", neighbours, memo)) == ["b", *range(101)]
+    assert set(memo) == {"a", "b"}
+    assert expanded == {"a": 1, "b": 1, **{i: 2 for i in range(101)}}
+
+
+def test_filter_json() -> None:
+    """Test lineages are fetched in either direction, up to some depth."""
+    assert filter_json("view2", OBJECTS) == {
+        "view2": ["view1", "table2"],
+        "view1": ["table1"],
+    }
+    assert filter_json("view1", OBJECTS, direction="downstream") == {
+        "view1": [],
+        "view2": ["view1"],
+        "view4": ["view1"],
+        "view3": ["view2"],
+    }
+    assert filter_json("view2", OBJECTS, direction="both", max_depth=1) == {
+        "view2": ["view1", "table2"],
+        "view1": [],
+        "view3": ["view2"],
+    }
+
+    # index built once for several queries
+    index = index_json(OBJECTS)
+    assert filter_json("view3", OBJECTS, index=index, max_depth=1) == {
+        "view3": ["view2"],
+        "view2": [],
+    }
+    assert filter_json("table1", OBJECTS, index=index) == {}
+
+    with pytest.raises(ValueError):
+        filter_json("view1", OBJECTS, direction="sideways")
+
+
+def test_graph_index(tmp_path: pathlib.Path) -> None:
+    """Test the binary index answers the exact same queries as the JSON objects."""
+    path = tmp_path / "objects.idx"
+    build_index(OBJECTS, path)
+
+    assert is_index(path)
+
+    with GraphIndex(path) as g:
+        assert (g.nodes, g.objects) == (6, 4)
+        assert g.name(g.id("table2")) == "table2"
+        assert g.id("table3") is None
+
+        for name in (*OBJECTS, "table1", "table3"):
+            for direction in ("upstream", "downstream", "both"):
+                for max_depth in (None, 0, 1):
+                    assert list(
+                        filter_index(name, g, direction, max_depth).items()
+                    ) == list(
+                        filter_json(name, OBJECTS, None, direction, max_depth).items()
+                    )
+
+
+def test_filter_batch(tmp_path: pathlib.Path) -> None:
+    """Test batch queries match single queries, one by one or all together."""
+    names = ["view3", "view2", "view4", "table3"]
+
+    for direction in ("upstream", "downstream", "both"):
+        for max_depth in (None, 1):
+            assert filter_batch(names, OBJECTS, direction, max_depth) == {
+                n: filter_json(n, OBJECTS, None, direction, max_depth) for n in names
+            }
+
+    assert filter_batch(names, OBJECTS, union=True) == {
+        "view3": ["view2"],
+        "view2": ["view1", "table2"],
+        "view1": ["table1"],
+        "view4": ["view1"],
+    }
+    assert filter_batch(["view2", "view4"], OBJECTS, "downstream", 1, True) == {
+        "view2": [],
+        "view4": [],
+        "view3": ["view2"],
+    }
+
+    path = tmp_path / "objects.idx"
+    build_index(OBJECTS, path)
+
+    with GraphIndex(path) as g:
+        for union in (False, True):
+            assert filter_index_batch(names, g, "both", union=union) == filter_batch(
+                names, OBJECTS, "both", union=union
+            )
+
+
+def test_pipe(tmp_path: pathlib.Path) -> None:
+    """Test files are read once, such that each format can be piped to the script."""
+    build_index(OBJECTS, tmp_path / "objects.idx")
+    (tmp_path / "objects.json").write_bytes(dump_graph(OBJECTS))
+
+    assert read_input(tmp_path / "objects.json") == dump_graph(OBJECTS)
+    with read_input(tmp_path / "objects.idx") as g:
+        assert (g.nodes, g.objects) == (6, 4)
+
+    index = (tmp_path / "objects.idx").read_bytes()
+
+    for content in (dump_graph(OBJECTS), dump_graph(OBJECTS, "bin"), index):
+        p = subprocess.run(
+            [sys.executable, "filter_json.py", "view2", "/dev/stdin"],
+            input=content,
+            capture_output=True,
+            check=True,
+            cwd=pathlib.Path(__file__).parent,
+        )
+
+        assert json.loads(p.stdout) == filter_json("view2", OBJECTS)
@@ -0,0 +1,68 @@
+"""Some test regarding the rendering of diagrams."""
+
+import io
+
+from format_json import iter_mmd, number_nodes, to_dot, to_mmd, write_lines
+
+OBJECTS = {"view2": ["view1", "table2"], "view1": ["table1"]}
+
+
+def test_number_nodes() -> None:
+    """Test objects and dependencies are numbered in order of first appearance."""
+    assert number_nodes(OBJECTS) == {"view2": 1, "view1": 2, "table2": 3, "table1": 4}
+
+
+def test_to_dot() -> None:
+    """Test one link per dependency is rendered, labels escaped."""
+    assert to_dot({**OBJECTS, 'say "hi"': []}) == (
+        "graph {\n"
+        "  // nodes\n"
+        '  node1 [label="view2"]\n'
+        '  node2 [label="view1"]\n'
+        '  node3 [label="table2"]\n'
+        '  node4 [label="table1"]\n'
+        '  node5 [label="say \\"hi\\""]\n'
+        "  // links\n"
+        "  node1 -- node2\n"
+        "  node1 -- node3\n"
+        "  node2 -- node4\n"
+        "}\n"
+    )
+
+
+def test_to_mmd() -> None:
+    """Test one link per dependency is rendered."""
+    assert to_mmd(OBJECTS) == (
+        "graph TB\n"
+        "  %% nodes\n"
+        "  node1(view2)\n"
+        "  node2(view1)\n"
+        "  node3(table2)\n"
+        "  node4(table1)\n"
+        "  %% links\n"
+        "  node1 --- node2\n"
+        "  node1 --- node3\n"
+        "  node2 --- node4\n"
+    )
+
+
+def test_write_lines() -> None:
+    """Test lines are written in chunks, flushed as they go."""
+
+    class Sink(io.StringIO):
+        """Record the chunks written."""
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.chunks: list[str] = []
+
+        def write(self, s: str) -> int:
+            self.chunks.append(s)
+            return super().write(s)
+
+    f = Sink()
+    write_lines(iter_mmd(OBJECTS), f, chunk_size=32)
+
+    assert f.getvalue() == to_mmd(OBJECTS)
+    assert len(f.chunks) > 1
+    assert all(len(c) < 32 + 20 for c in f.chunks)
@@ -0,0 +1,91 @@
+"""Some test regarding the in-memory graph."""
+
+import io
+import json
+import pathlib
+
+import pytest
+
+from csv_to_json import graph_csv, stream_json
+from filter_json import filter_index, filter_json
+from format_json import to_dot, to_mmd
+from graph import Graph, dump_graph, is_bin, read_graph, read_json
+
+# view3 -> view2 -> view1 -> table1, view2 -> table2, view4 -> view1
+OBJECTS = {
+    "view1": ["table1"],
+    "view2": ["view1", "table2"],
+    "view3": ["view2"],
+    "view4": ["view1"],
+}
+
+
+def test_graph() -> None:
+    """Test nodes are numbered, and dependencies indexed in both directions."""
+    g = Graph.from_json(OBJECTS)
+
+    assert (g.nodes, g.objects, g.edges) == (6, 4, 5)
+    assert g.names == ["view1", "table1", "view2", "table2", "view3", "view4"]
+    assert g.is_object(g.id("view1")) and not g.is_object(g.id("table1"))
+    assert g.id("view5") is None
+
+    assert [g.name(i) for i in g.parents(g.id("view2"))] == ["view1", "table2"]
+    assert [g.name(i) for i in g.children(g.id("view1"))] == ["view2", "view4"]
+
+    # dependencies added later are merged, deduplicated
+    g.add("view4", ["view1", "table2"])
+    g.add("view5")
+
+    assert [g.name(i) for i in g.children(g.id("table2"))] == ["view2", "view4"]
+    assert g.to_json() == {**OBJECTS, "view4": ["view1", "table2"], "view5": []}
+
+
+def test_read_json(tmp_path: pathlib.Path) -> None:
+    """Test files are merged, and the graph queried and rendered as the JSON content."""
+    (tmp_path / "1.json").write_text(json.dumps(OBJECTS))
+    (tmp_path / "2.json").write_text(json.dumps({"view3": ["view2", "view4"]}))
+
+    g = read_json([tmp_path / "1.json", tmp_path / "2.json"])
+    objects = {**OBJECTS, "view3": ["view2", "view4"]}
+
+    assert g.to_json() == objects
+    assert filter_index("view1", g) == filter_json("view1", objects)
+    assert to_dot(g) == to_dot(objects)
+    assert to_mmd(g) == to_mmd(objects)
+
+
+def test_graph_csv() -> None:
+    """Test the CSV content is gathered as by `stream_json()`."""
+    content = "view1,table1\nview2,table1\nview1,table1\nview1,table2\n"
+
+    g = graph_csv(io.StringIO(content, newline=""))
+    o = stream_json(io.StringIO(content, newline=""))
+
+    assert g.to_json() == {k: list(v) for k, v in o.items()}
+
+
+def test_bin(tmp_path: pathlib.Path) -> None:
+    """Test the binary format round trips, and is read along with JSON files."""
+    g = Graph.from_json({**OBJECTS, "view5": []})
+
+    for compress in (False, True):
+        h = Graph.from_bin(g.to_bin(compress))
+
+        assert h.names == g.names
+        assert h.to_json() == g.to_json()
+        assert list(h.children(h.id("view1"))) == list(g.children(g.id("view1")))
+
+    (tmp_path / "1.bin").write_bytes(dump_graph(OBJECTS, "bin", compress=True))
+    (tmp_path / "2.json").write_bytes(dump_graph({"view3": ["view2", "view4"]}))
+
+    assert is_bin(tmp_path / "1.bin") and not is_bin(tmp_path / "2.json")
+    assert read_graph([tmp_path / "1.bin", tmp_path / "2.json"]).to_json() == {
+        **OBJECTS,
+        "view3": ["view2", "view4"],
+    }
+    assert read_graph([]).to_json() == Graph.from_bin(Graph().to_bin()).to_json() == {}
+
+    with pytest.raises(ValueError):
+        dump_graph(OBJECTS, "xml")
+    with pytest.raises(ValueError):
+        Graph.from_json({"view\x001": []}).to_bin()
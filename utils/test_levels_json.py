@@ -0,0 +1,39 @@
+"""Some test regarding the levels of graphs."""
+
+import pytest
+
+from levels_json import group_levels, levels_json
+from reduce_json import CycleError
+
+# a -> b -> c -> d, a -> d, e -> d
+OBJECTS = {"a": ["b", "d"], "b": ["c"], "c": ["d"], "e": ["d"]}
+
+
+def test_levels_json() -> None:
+    """Test each object is one level above its highest dependency."""
+    levels, path = levels_json(OBJECTS)
+
+    # d is only a source, neither levelled nor counted
+    assert levels == {"c": 0, "e": 0, "b": 1, "a": 2}
+    assert path == ["c", "b", "a"]
+    assert group_levels(levels) == [["c", "e"], ["b"], ["a"]]
+    assert levels_json({**OBJECTS, "d": []})[0] == {
+        "d": 0,
+        "c": 1,
+        "e": 1,
+        "b": 2,
+        "a": 3,
+    }
+
+    with pytest.raises(CycleError):
+        levels_json({**OBJECTS, "d": ["a"]})
+
+
+def test_deep_lineage() -> None:
+    """Test long chains do not hit the recursion limit."""
+    objects = {f"t{i}": [f"t{i + 1}"] for i in range(10000)}
+    levels, path = levels_json(objects)
+
+    assert levels["t0"] == 9999
+    assert len(path) == 10000
+    assert group_levels({}) == []
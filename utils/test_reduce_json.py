@@ -0,0 +1,41 @@
+"""Some test regarding the transitive reduction of graphs."""
+
+import pytest
+
+from reduce_json import CycleError, find_cycles, topological_order, transitive_reduction
+
+# a -> b -> c -> d, a -> c, a -> d, b -> d, e -> d
+OBJECTS = {"a": ["b", "c", "d"], "b": ["c", "d"], "c": ["d"], "e": ["d"]}
+
+
+def test_topological_order() -> None:
+    """Test each node comes after its dependencies, nodes on a cycle left out."""
+    order, children = topological_order(OBJECTS)
+
+    assert order == ["d", "c", "e", "b", "a"]
+    assert children["d"] == ["a", "b", "c", "e"]
+
+    order, _ = topological_order({**OBJECTS, "d": ["b"]})
+    assert order == []
+
+
+def test_transitive_reduction() -> None:
+    """Test dependencies implied by others are dropped, lineages kept."""
+    assert transitive_reduction(OBJECTS) == {
+        "a": ["b"],
+        "b": ["c"],
+        "c": ["d"],
+        "e": ["d"],
+    }
+
+
+def test_cycles() -> None:
+    """Test cycles are reported rather than reduced."""
+    objects = {**OBJECTS, "d": ["b"], "x": ["x"], "y": ["e"]}
+
+    assert find_cycles(objects) == [["b", "c", "d"], ["x"]]
+
+    with pytest.raises(CycleError) as e:
+        transitive_reduction(objects)
+    assert e.value.cycles == [["b", "c", "d"], ["x"]]
+    assert str(e.value) == "2 cycle(s) found: b -> c -> d -> b"
@@ -1,6 +1,30 @@
 """Some test regarding our little SQL parsing."""
 
-from sql_to_json import clean_functions, clean_query, fetch_dependencies, split_query
+import json
+import pathlib
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+
+import sql_to_json
+from sql_to_json import (
+    DependencyCache,
+    DependencyState,
+    Profiler,
+    Quarantine,
+    clean_functions,
+    clean_query,
+    extract_dependencies,
+    extract_files,
+    fetch_dependencies,
+    iter_dependencies,
+    split_query,
+    split_statements,
+    watch_dependencies,
+    watch_files,
+)
 
 
 def _process(query: str) -> tuple[str, dict[str, str], dict[str, list[str]]]:
@@ -440,3 +464,388 @@ def test_subqueries() -> None:
         "subquery3": ["table4"],
         "SELECT": ["subquery1", "subquery2", "subquery3"],
     }
+
+
+def test_parallel_extraction(tmp_path: pathlib.Path) -> None:
+    """Test the multi-process extraction yields the exact same output as a serial run.
+
+    ```sql
+    create view view1 as select * from table1;
+    select * from view1 join table2 on view1.attr = table2.attr;
+    ```
+
+    ```sql
+    create view view2 as select * from view1;
+    select * from view2;
+    ```
+    """
+    (tmp_path / "1.sql").write_text(
+        "create view view1 as select * from table1;\n"
+        "select * from view1 join table2 on view1.attr = table2.attr;\n"
+    )
+    (tmp_path / "2.sql").write_text(
+        "create view view2 as select * from view1;\nselect * from view2;\n"
+    )
+    paths = [str(tmp_path / "1.sql"), str(tmp_path / "2.sql")]
+
+    d = extract_files(paths)
+
+    assert d == {
+        "view1": ["table1"],
+        "SELECT": ["table2", "view1", "view2"],
+        "view2": ["view1"],
+    }
+    assert list(extract_files(paths, jobs=2).items()) == list(d.items())
+
+    # one statement after the other, in order
+    for jobs in (1, 2):
+        assert list(iter_dependencies(paths, jobs)) == [
+            (paths[0], {"view1": ["table1"]}),
+            (paths[0], {"SELECT": ["table2", "view1"]}),
+            (paths[1], {"view2": ["view1"]}),
+            (paths[1], {"SELECT": ["view2"]}),
+        ]
+
+
+def test_cache(tmp_path: pathlib.Path) -> None:
+    """Test cached statements are served as is, and the cache is trimmed when full.
+
+    ```sql
+    create view view1 as select * from table1;
+    create view view2 as select * from table2;
+    ```
+    """
+    (tmp_path / "1.sql").write_text(
+        "create view view1 as select * from table1;\n"
+        "create view view2 as select * from table2;\n"
+    )
+    paths = [str(tmp_path / "1.sql")]
+
+    cache = DependencyCache(str(tmp_path / "cache"))
+    d = extract_files(paths, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert extract_files(paths, cache=cache) == d
+    assert (cache.hits, cache.misses) == (2, 2)
+    cache.close()
+
+    # only the last statement stored remains
+    cache = DependencyCache(str(tmp_path / "cache"), max_entries=1)
+    assert extract_files(paths, cache=cache) == d
+    assert extract_files(paths, cache=cache) == d
+    assert (cache.hits, cache.misses) == (3, 1)
+    cache.close()
+
+
+def test_state(tmp_path: pathlib.Path) -> None:
+    """Test only changed files are processed again, and affected objects reported.
+
+    ```sql
+    create view view1 as select * from table1;
+    ```
+
+    ```sql
+    create view view2 as select * from view1;
+    ```
+    """
+    (tmp_path / "1.sql").write_text("create view view1 as select * from table1;\n")
+    (tmp_path / "2.sql").write_text("create view view2 as select * from view1;\n")
+    paths = [str(tmp_path / "1.sql"), str(tmp_path / "2.sql")]
+
+    state = DependencyState(str(tmp_path / "state.json"))
+    d, affected = state.update(paths)
+    assert d == extract_files(paths)
+    assert affected == ["view1", "view2"]
+    assert (state.parsed, state.unchanged) == (2, 0)
+    state.save()
+
+    # same content, touched
+    (tmp_path / "2.sql").write_text("create view view2 as select * from view1;\n")
+    state = DependencyState(str(tmp_path / "state.json"))
+    assert state.update(paths) == (d, [])
+    assert (state.parsed, state.unchanged) == (0, 2)
+    state.save()
+
+    # upstream object changed, downstream ones affected
+    (tmp_path / "1.sql").write_text("create view view1 as select * from table2;\n")
+    state = DependencyState(str(tmp_path / "state.json"))
+    d, affected = state.update(paths)
+    assert d == extract_files(paths)
+    assert affected == ["view1", "view2"]
+    assert (state.parsed, state.unchanged) == (1, 1)
+
+    # file dropped
+    assert state.update(paths[:1]) == ({"view1": ["table2"]}, ["view2"])
+
+
+def test_watch(tmp_path: pathlib.Path) -> None:
+    """Test changes are caught, via `inotify` or polling alike."""
+    (tmp_path / "1.sql").write_text("select * from table1;\n")
+    (tmp_path / "2.sql").write_text("select * from table2;\n")
+
+    for events in (
+        watch_files([str(tmp_path / "1.sql")]),
+        watch_files([str(tmp_path / "1.sql")], 0.01, poll=True),
+    ):
+        # changes to other files are ignored, replacing the file is caught
+        def edit() -> None:
+            (tmp_path / "2.sql").write_text("select * from table3;\n")
+            (tmp_path / "tmp.sql").write_text("select * from table4;\n")
+            (tmp_path / "tmp.sql").replace(tmp_path / "1.sql")
+
+        timer = threading.Timer(0.1, edit)
+        timer.start()
+        assert next(events) is None
+        timer.join()
+
+
+def test_watch_dependencies(tmp_path: pathlib.Path) -> None:
+    """Test the output is written on start, then rewritten after each change."""
+    path = tmp_path / "1.sql"
+    path.write_text("create view view1 as select * from table1;\n")
+    output = tmp_path / "dependencies.json"
+    written = []
+
+    def events() -> Iterator[None]:
+        written.append(json.loads(output.read_text()))
+        path.write_text("create view view1 as select * from table10;\n")
+        yield
+
+    watch_dependencies([str(path)], str(output), events=events())
+
+    assert written == [{"view1": ["table1"]}]
+    assert json.loads(output.read_text()) == {"view1": ["table10"]}
+
+
+def test_profiler(tmp_path: pathlib.Path) -> None:
+    """Test each stage of each file is recorded, without altering the output.
+
+    ```sql
+    create view view1 as select * from table1;
+    select * from view1;
+    ```
+    """
+    (tmp_path / "1.sql").write_text(
+        "create view view1 as select * from table1;\nselect * from view1;\n"
+    )
+    paths = [str(tmp_path / "1.sql")]
+
+    profiler = Profiler()
+    assert extract_files(paths, jobs=2, profiler=profiler) == extract_files(paths)
+    profiler.stop()
+
+    # one split of the file, then each stage once per statement
+    assert [r[1] for r in profiler.records] == [
+        "split_statements",
+        *[
+            "format_query",
+            "clean_query",
+            "clean_functions",
+            "split_query",
+            "fetch_dependencies",
+        ]
+        * 2,
+    ]
+    assert {r[0] for r in profiler.records} == {paths[0]}
+    assert sum(map(sum, profiler.histogram().values())) == 11
+    assert [a for a, _, _ in profiler.slowest()] == paths
+    assert len(profiler.chrome_trace()["traceEvents"]) == 11
+    assert "fetch_dependencies" in profiler.report()
+
+
+def test_quarantine(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test statements exceeding the limits are set aside, the others processed.
+
+    ```sql
+    create view view1 as select * from table1;
+    create view view2 as select * from table2 join table3 on ... join table3 on ...;
+    create view view3 as select * from table4;
+    ```
+    """
+    joins = " join table3 on table2.attr = table3.attr" * 100
+    (tmp_path / "1.sql").write_text(
+        "create view view1 as select * from table1;\n"
+        f"create view view2 as select * from table2{joins};\n"
+        "create view view3 as select * from table4;\n"
+    )
+    paths = [str(tmp_path / "1.sql")]
+
+    # the second statement stalls (way past the time allowed), the others do not
+    def stall(query: str) -> str:
+        if "table2" in query:
+            time.sleep(60)
+        return clean_functions(query)
+
+    cases = [(jobs, Quarantine(max_size=1000)) for jobs in (1, 2)]
+    cases.append((1, Quarantine(timeout=0.5)))
+
+    for jobs, quarantine in cases:
+        with monkeypatch.context() as m:
+            m.setattr(sql_to_json, "clean_functions", stall)
+            assert extract_files(paths, jobs, quarantine=quarantine) == {
+                "view1": ["table1"],
+                "view3": ["table4"],
+            }
+        assert [(r["file"], r["size"]) for r in quarantine.records] == [
+            (paths[0], len(joins) + 42)
+        ]
+
+    # files with statements set aside are processed again on the next run
+    state = DependencyState(None)
+    state.update(paths, quarantine=Quarantine(max_size=1000))
+    assert state.changed(paths) == paths
+
+
+def test_many_subqueries() -> None:
+    """Test a (generated) query chaining a lot of CTEs, some embedding nested CTEs.
+
+    ```sql
+    with
+      subquery0 as (
+        select *
+        from (
+          with nested0 as (select * from table0)
+          select * from nested0
+        )
+      ),
+      subquery1 as (select * from subquery0 join table1 on subquery0.attr = table1.attr),
+      subquery2 as (select * from subquery1 join table2 on subquery1.attr = table2.attr),
+      ...
+    select * from subquery149
+    ```
+    """
+    q = []
+    for i in range(150):
+        if i % 50:
+            q.append(
+                f"subquery{i} as (select * from subquery{i - 1} "
+                f"join table{i} on subquery{i - 1}.attr = table{i}.attr)"
+            )
+        else:
+            q.append(
+                f"subquery{i} as (select * from (with nested{i} as "
+                f"(select * from table{i}) select * from nested{i}))"
+            )
+
+    q, _, d = _process(f"with {', '.join(q)} select * from subquery149")
+
+    assert len(d) == 154
+    assert d["nested0"] == ["table0"]
+    assert d["subquery0"] == ["nested0"]
+    assert d["subquery1"] == ["subquery0", "table1"]
+    assert d["subquery100"] == ["nested100"]
+    assert d["subquery149"] == ["subquery148", "table149"]
+    assert d["SELECT"] == ["subquery149"]
+    assert list(d)[:3] == ["nested0", "subquery0", "subquery1"]
+
+
+def test_clean_query() -> None:
+    """Test the cleaning of a query, spread over multiple lines.
+
+    ```sql
+    select t . a, b || c as d, e :: int
+    from s . t /* comment */
+    where x <> 1
+      and y >= 2 -- comment
+      and z = 3;
+    ```
+
+    Note the last comparison operator of each line only is (historically) spaced out.
+    """
+    q = clean_query("""
+        select t . a, b || c as d, e :: int
+        from s . t /* comment */
+        where x <> 1
+          and y >= 2 -- comment
+          and z = 3;
+        """)
+
+    assert q == (
+        "select t.a , b || c as d , e ::int from s.t "
+        "where x < = 1 and y > = 2 and z = 3"
+    )
+
+
+def test_split_statements() -> None:
+    """Test the splitting of a script in statements.
+
+    ```sql
+    select ';' as attr1, "attr;2" from table1; -- comment; really
+    create function function1() returns int as $body$ select 1; $body$ language sql;
+    /* ; */ select $$;$$, 'it''s;', 'a\\';b';
+    select 1
+    ```
+    """
+    s = split_statements(
+        "select ';' as attr1, \"attr;2\" from table1; -- comment; really\n"
+        "create function function1() returns int as $body$ select 1; $body$ "
+        "language sql;\n"
+        "/* ; */ select $$;$$, 'it''s;', 'a\\';b';\n"
+        "select 1\n"
+    )
+
+    assert s == [
+        "select ';' as attr1, \"attr;2\" from table1;",
+        (
+            "-- comment; really\n"
+            "create function function1() returns int as $body$ select 1; $body$ "
+            "language sql;"
+        ),
+        "/* ; */ select $$;$$, 'it''s;', 'a\\';b';",
+        "select 1",
+    ]
+
+
+def test_sqlparse_fallback() -> None:
+    """Test `sqlparse` and the built-in lexer agree on a (commented) query.
+
+    ```sql
+    -- comment
+    CREATE VIEW view1 AS
+    SELECT attr1, 'From' AS "Select" /* comment */
+    FROM table1 -- comment
+    INNER JOIN table2
+    ON table1.attr1 = table2.attr1;
+    ```
+    """
+    rq = """
+    -- comment
+    CREATE VIEW view1 AS
+    SELECT attr1, 'From' AS "Select" /* comment */
+    FROM table1 -- comment
+    INNER JOIN table2
+    ON table1.attr1 = table2.attr1;
+    """
+
+    assert clean_query(rq) == clean_query(rq, use_sqlparse=True)
+    assert extract_dependencies(rq) == {"view1": ["table1", "table2"]}
+    assert extract_dependencies(rq, use_sqlparse=True) == {
+        "view1": ["table1", "table2"]
+    }
+
+
+def test_clean_functions() -> None:
+    """Test the escaping of `FROM` keywords within (nested) functions.
+
+    ```sql
+    select
+      trim('a b' from attr1),
+      extract(month from to_timestamp(trim('"' from attr2), 'YYYY-MM-DD')),
+      substring(attr3 from 2)
+    from table1
+    ```
+    """
+    rq = """
+        select
+          trim('a b' from attr1),
+          extract(month from to_timestamp(trim('"' from attr2), 'YYYY-MM-DD')),
+          substring(attr3 from 2)
+        from table1
+    """
+
+    q = clean_functions(clean_query(rq))
+
+    assert q == (
+        "select trim ( 'a b' %FROM% attr1 ) , "
+        "extract ( month %FROM% to_timestamp ( trim ( '\"' %FROM% attr2 ) , "
+        "'YYYY-MM-DD' ) ) , substring ( attr3 %FROM% 2 ) from table1"
+    )